@@ -0,0 +1,215 @@
+import os
+
+import numpy as np
+
+from face_store import ENCODING_SIZE
+
+
+def _squared_distances(queries, vectors, vector_norms=None):
+    if vector_norms is None:
+        vector_norms = np.einsum('ij,ij->i', vectors, vectors)
+    squared = (np.einsum('ij,ij->i', queries, queries)[:, None]
+               + vector_norms[None, :] - 2.0 * (queries @ vectors.T))
+    return np.maximum(squared, 0, out=squared)
+
+
+def kmeans(vectors, k, iterations=10, seed=0):
+    """Plain Lloyd k-means, returns float32 centroids"""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmin(_squared_distances(vectors, centroids), axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty buckets from random points so every list is used
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+    return centroids
+
+
+class _InvertedList:
+    """Growable block of (vector, id) pairs for one coarse bucket"""
+
+    def __init__(self):
+        self.count = 0
+        self.vectors = np.zeros((8, ENCODING_SIZE), np.float32)
+        self.norms = np.zeros(8, np.float32)
+        self.ids = np.zeros(8, np.int64)
+
+    def append(self, vectors, ids):
+        needed = self.count + len(ids)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids))
+            self.vectors = np.resize(self.vectors, (capacity, ENCODING_SIZE))
+            self.norms = np.resize(self.norms, capacity)
+            self.ids = np.resize(self.ids, capacity)
+        self.vectors[self.count:needed] = vectors
+        self.norms[self.count:needed] = np.einsum('ij,ij->i', vectors, vectors)
+        self.ids[self.count:needed] = ids
+        self.count = needed
+
+    def remove(self, ids):
+        """Drop entries by id, filling the gaps from the end of the block"""
+        for position in sorted(np.flatnonzero(np.isin(self.ids[:self.count], list(ids))), reverse=True):
+            last = self.count - 1
+            self.vectors[position] = self.vectors[last]
+            self.norms[position] = self.norms[last]
+            self.ids[position] = self.ids[last]
+            self.count = last
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index (pure NumPy).
+
+    Encodings are bucketed by their nearest coarse k-means centroid; a
+    search only scans the nprobe buckets closest to the query. Until enough
+    vectors have been added to train the centroids the index falls back to
+    an exact scan, and it retrains once the gallery has grown well past the
+    size it was trained on. Only the centroids are persisted: re-bucketing
+    a gallery against known centroids is a single matrix product, while
+    training is the expensive part.
+    """
+
+    def __init__(self, nlist=None, nprobe=8, min_train=1024, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.seed = seed
+        self.centroids = None
+        self.trained_on = 0
+        self.dirty = False
+        self.reset()
+
+    def reset(self):
+        """Drop all vectors, keeping the trained centroids"""
+        self.count = 0
+        self._where = {}
+        self._pending = _InvertedList()
+        self._lists = [_InvertedList() for _ in range(len(self.centroids))] \
+            if self.centroids is not None else []
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def _all_vectors(self):
+        if not self.is_trained:
+            return self._pending.vectors[:self._pending.count], self._pending.ids[:self._pending.count]
+        vectors = [l.vectors[:l.count] for l in self._lists] + [np.zeros((0, ENCODING_SIZE), np.float32)]
+        ids = [l.ids[:l.count] for l in self._lists] + [np.zeros(0, np.int64)]
+        return np.concatenate(vectors), np.concatenate(ids)
+
+    def train(self, vectors):
+        """Fit coarse centroids on a sample of the gallery"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        nlist = self.nlist or int(np.clip(4 * np.sqrt(len(vectors)), 16, 4096))
+        nlist = min(nlist, len(vectors))
+        sample_size = min(len(vectors), 64 * nlist)
+        sample = vectors[np.random.default_rng(self.seed).choice(len(vectors), sample_size, replace=False)]
+        self.centroids = kmeans(sample, nlist, seed=self.seed)
+        self.trained_on = len(vectors)
+        self.dirty = True
+
+    def _retrain(self):
+        vectors, ids = self._all_vectors()
+        self.train(vectors)
+        self.reset()
+        self._bucket(vectors, ids)
+
+    def _bucket(self, vectors, ids, chunk=16384):
+        for start in range(0, len(ids), chunk):
+            block, block_ids = vectors[start:start + chunk], ids[start:start + chunk]
+            assignment = np.argmin(_squared_distances(block, self.centroids), axis=1)
+            order = np.argsort(assignment, kind="stable")
+            buckets, starts = np.unique(assignment[order], return_index=True)
+            for bucket, lo, hi in zip(buckets, starts, list(starts[1:]) + [len(order)]):
+                rows = order[lo:hi]
+                self._lists[bucket].append(block[rows], block_ids[rows])
+                self._where.update(dict.fromkeys(block_ids[rows].tolist(), int(bucket)))
+        self.count += len(ids)
+
+    def add(self, vectors, ids):
+        """Add encodings under the given integer ids"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+
+        if not self.is_trained:
+            self._pending.append(vectors, ids)
+            self._where.update(dict.fromkeys(ids.tolist(), -1))
+            self.count += len(ids)
+            if self.count >= self.min_train:
+                self._retrain()
+            return
+
+        self._bucket(vectors, ids)
+        if self.count > 4 * self.trained_on:
+            self._retrain()
+
+    def remove(self, ids):
+        """Drop encodings by id (e.g. before re-adding updated vectors)"""
+        by_list = {}
+        for i in ids:
+            bucket = self._where.pop(int(i), None)
+            if bucket is not None:
+                by_list.setdefault(bucket, []).append(int(i))
+        for bucket, bucket_ids in by_list.items():
+            (self._pending if bucket < 0 else self._lists[bucket]).remove(bucket_ids)
+            self.count -= len(bucket_ids)
+
+    def search(self, queries, k=2):
+        """Return (distances, ids) of the k nearest stored vectors per query.
+
+        Missing neighbours are reported as distance inf and id -1.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        distances = np.full((len(queries), k), np.inf, np.float32)
+        ids = np.full((len(queries), k), -1, np.int64)
+
+        if self.is_trained:
+            nprobe = min(self.nprobe, len(self.centroids))
+            probes = np.argpartition(_squared_distances(queries, self.centroids), nprobe - 1, axis=1)[:, :nprobe]
+
+        for i, query in enumerate(queries):
+            if self.is_trained:
+                lists = [self._lists[c] for c in probes[i] if self._lists[c].count]
+            else:
+                lists = [self._pending] if self._pending.count else []
+            if not lists:
+                continue
+            vectors = np.concatenate([l.vectors[:l.count] for l in lists])
+            norms = np.concatenate([l.norms[:l.count] for l in lists])
+            candidate_ids = np.concatenate([l.ids[:l.count] for l in lists])
+
+            squared = _squared_distances(query[None, :], vectors, norms)[0]
+            top = min(k, len(squared))
+            nearest = np.argpartition(squared, top - 1)[:top]
+            nearest = nearest[np.argsort(squared[nearest])]
+            distances[i, :top] = np.sqrt(squared[nearest])
+            ids[i, :top] = candidate_ids[nearest]
+        return distances, ids
+
+    def save(self, path):
+        """Persist the trained centroids"""
+        if not self.is_trained:
+            return
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, centroids=self.centroids, trained_on=self.trained_on, nprobe=self.nprobe)
+        os.replace(tmp, path)
+        self.dirty = False
+
+    def load(self, path):
+        """Reuse centroids saved at path, if there are any"""
+        if not os.path.exists(path):
+            return
+        with np.load(path) as data:
+            self.centroids = data["centroids"]
+            self.trained_on = int(data["trained_on"])
+        self.nlist = len(self.centroids)
+        self.dirty = False
+        self.reset()
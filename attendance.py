@@ -1,44 +1,100 @@
-import cv2
-import face_recognition
+import base64
+from collections import Counter
 import os
-import json
-from datetime import datetime
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-import time
+import queue
+import threading
+from datetime import datetime, timedelta
+
+from attendance_store import AttendanceStore
+from face_store import EncodingStore
+from lazy import LazyModule
+from matcher import DEFAULT_PROTOTYPES, DEFAULT_TOLERANCE, FaceMatcher
+from metrics import NULL_METRICS, Metrics
+from quality import QualityGate
+from reports import MARK_COLUMNS, RATE_COLUMNS, AttendanceReports, export_csv, parse_date
+
+# Imported on first use, so manual attendance and reports never load OpenCV
+# or dlib, and scripts that only need SimpleAttendance never load Tk
+cv2 = LazyModule("cv2")
+face_recognition = LazyModule("face_recognition")
+tk = LazyModule("tkinter")
+filedialog = LazyModule("tkinter.filedialog")
+messagebox = LazyModule("tkinter.messagebox")
+ttk = LazyModule("tkinter.ttk")
 
 class SimpleAttendance:
-    def __init__(self):
-        self.known_faces = []
-        self.known_names = []
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, index=None, max_prototypes=DEFAULT_PROTOTYPES,
+                 metrics=None, quality=True, load=True):
+        self.matcher = FaceMatcher(tolerance, index, max_prototypes)
+        self.metrics = metrics or NULL_METRICS
+        # Faces failing the quality gate are reported as Unknown without being encoded
+        self.quality = QualityGate() if quality is True else (quality or None)
+        self.skipped = Counter()
         self.attendance = {}
+        self.records = AttendanceStore("attendance.db")
+        self.load_attendance()
         
         # Create folder for faces
         os.makedirs("faces", exist_ok=True)
-        self.load_faces()
-    
-    def load_faces(self):
-        """Load all face images from 'faces' folder"""
-        self.known_faces = []
-        self.known_names = []
-        
-        for filename in os.listdir("faces"):
-            if filename.endswith(('.jpg', '.png')):
-                name = filename.split('.')[0]
-                image = face_recognition.load_image_file(f"faces/{filename}")
-                encoding = face_recognition.face_encodings(image)
-                
-                if encoding:
-                    self.known_faces.append(encoding[0])
-                    self.known_names.append(name)
-                    print(f"✓ Loaded: {name}")
+        self.store = EncodingStore("faces")
+        self.index_path = os.path.join(self.store.cache_dir, "index.npz")
+        if index is not None:
+            index.load(self.index_path)
+        # load=False leaves the gallery empty until load_faces() is called (e.g. on a background thread)
+        if load:
+            self.load_faces()
+    
+    def load_faces(self, progress=None):
+        """Load all face images from 'faces' folder, encoding only new or changed ones.
+        
+        progress(done, total) is called as each photo is checked.
+        """
+        self.store.sync(self.encode_image, progress)
+        encodings, names = self.store.gallery()
+        # Only people whose photos changed since the saved prototypes are re-clustered
+        saved = self.matcher.clusters or self.store.load_clusters()
+        self.matcher.set(encodings, names, saved)
+        if {name: key for name, (key, _) in self.matcher.clusters.items()} != \
+                {name: key for name, (key, _) in saved.items()}:
+            self.store.save_clusters(self.matcher.clusters)
+        self.save_index()
+        
+        stats = self.store.stats
+        print(f"✓ Loaded {len(names)} photos of {len(self.matcher.identities)} people "
+              f"({stats['encoded']} encoded, {stats['reused']} from cache)")
+    
+    @property
+    def known_faces(self):
+        return self.matcher.encodings
+    
+    @property
+    def known_names(self):
+        return self.matcher.identities
+    
+    def encode_image(self, path):
+        """Encode the first face in an image file, or None if there is none"""
+        image = face_recognition.load_image_file(path)
+        encoding = face_recognition.face_encodings(image)
+        return encoding[0] if encoding else None
     
     def add_person(self, name, image_path):
-        """Add new person"""
+        """Add a photo of a new or already registered person"""
         import shutil
-        shutil.copy(image_path, f"faces/{name}.jpg")
-        self.load_faces()
-        print(f"✓ Added: {name}")
+        # Number photos so re-enrolling adds to the gallery instead of overwriting
+        filename = self.store.photo_filename(name)
+        shutil.copy(image_path, os.path.join("faces", filename))
+        
+        encoding = self.store.add(filename, self.encode_image)
+        if encoding is not None:
+            self.matcher.add(encoding, name)
+            self.save_index()
+        print(f"✓ Added: {name} ({self.matcher.photo_count(name)} photos)")
+    
+    def save_index(self):
+        """Persist the nearest-neighbour index when it has been (re)trained"""
+        index = self.matcher.index
+        if index is not None and index.dirty:
+            index.save(self.index_path)
     
     def mark_attendance(self, name):
         """Mark attendance"""
@@ -46,48 +102,100 @@ class SimpleAttendance:
         time = datetime.now().strftime("%H:%M")
         
         if today not in self.attendance:
-            self.attendance[today] = {}
+            self.attendance[today] = self.records.day(today)
         
-        if name not in self.attendance[today]:
+        if name not in self.attendance[today] and self.records.mark(today, name, time):
             self.attendance[today][name] = time
-            self.save_attendance()
             return True
         return False
     
-    def save_attendance(self):
-        """Save to file"""
-        with open("attendance.json", "w") as f:
-            json.dump(self.attendance, f, indent=2)
+    def load_attendance(self):
+        """Load today's attendance, importing an old attendance.json the first time"""
+        if os.path.exists("attendance.json"):
+            imported = self.records.import_json("attendance.json")
+            if imported:
+                print(f"✓ Imported {imported} records from attendance.json")
+        
+        today = datetime.now().strftime("%Y-%m-%d")
+        self.attendance = {today: self.records.day(today)}
     
     def recognize_faces(self, frame):
         """Recognize faces in frame"""
-        # Find faces
-        face_locations = face_recognition.face_locations(frame)
-        face_encodings = face_recognition.face_encodings(frame, face_locations)
-        
-        names = []
-        for face_encoding in face_encodings:
-            matches = face_recognition.compare_faces(self.known_faces, face_encoding)
-            name = "Unknown"
-            
-            if True in matches:
-                match_index = matches.index(True)
-                name = self.known_names[match_index]
+        face_locations, matches = self.match_faces(frame)
+        return face_locations, [match.name for match in matches]
+    
+    def match_faces(self, frame):
+        """Find faces in frame and match them all against the gallery at once"""
+        from pipeline import encode_faces
+        
+        with self.metrics.timer("detect"):
+            face_locations = face_recognition.face_locations(frame)
+        counts = {}
+        with self.metrics.timer("encode"):
+            face_encodings = encode_faces([frame], [face_locations], self.quality, [counts])[0]
+        with self.metrics.timer("match"):
+            matches = self.matcher.match(face_encodings)
+        self.count_skipped(counts)
+        self.metrics.count("frames_analyzed")
+        self.metrics.count("faces", len(matches))
+        return face_locations, matches
+    
+    def count_skipped(self, counts):
+        """Add one frame's quality-gate tallies to self.skipped"""
+        for key, value in counts.items():
+            if key.startswith("skipped_"):
+                self.skipped[key[len("skipped_"):]] += value
+                self.metrics.count(key, value)
+    
+    def recognize_batch(self, frames, batch_size=8, model="hog"):
+        """Recognize faces in many frames, batching dlib calls across frames.
+        
+        Returns a (face_locations, names) pair per frame, like recognize_faces.
+        """
+        from pipeline import find_and_encode
+        
+        results = []
+        for start in range(0, len(frames), batch_size):
+            batch = frames[start:start + batch_size]
+            counts = [{} for _ in batch]
+            locations, encodings = find_and_encode(batch, model, batch_size, gate=self.quality, counts=counts)
+            for frame_counts in counts:
+                self.count_skipped(frame_counts)
             
-            names.append(name)
-        
-        return face_locations, names
+            # Match every face of the batch against the gallery in one go
+            matches = iter(self.matcher.match([e for frame_encodings in encodings for e in frame_encodings]))
+            for frame_locations in locations:
+                results.append((frame_locations, [next(matches).name for _ in frame_locations]))
+        return results
 
 class SimpleGUI:
     def __init__(self):
-        self.attendance = SimpleAttendance()
+        # Stage timings are cheap enough to keep on and show after each video.
+        # The gallery is loaded in the background once the window is up.
+        self.attendance = SimpleAttendance(metrics=Metrics(), load=False)
         self.video_source = None
+        self.loader = None
+        self.load_progress = (0, 0)
+        self.load_error = None
+        
+        # Background video processing: the worker thread posts events that
+        # the Tk loop polls, and only ever touches widgets from the Tk thread
+        self.pipeline = None
+        self.worker = None
+        self.stopping = False
+        self.events = queue.Queue()
+        self.unpaused = threading.Event()
+        self.preview_data = None
+        self.preview_window = None
+        self.displayed_date = None
+        self.displayed = set()
         
         # Create window
         self.root = tk.Tk()
         self.root.title("Face Recognition Attendance System")
         self.root.geometry("600x700")
         self.root.configure(bg='#f0f0f0')
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Configure styles
         self.setup_styles()
@@ -119,6 +227,41 @@ class SimpleGUI:
         self.create_status_section(main_frame)
         
         self.update_display()
+        self.start_loading()
+    
+    def start_loading(self):
+        """Load the face gallery on a background thread; recognition is enabled when it is done"""
+        self.add_button.config(state=tk.DISABLED)
+        self.video_button.config(state=tk.DISABLED)
+        self.status_label.config(text="Loading faces...", fg='#e67e22')
+        self.loader = threading.Thread(target=self.load_worker, daemon=True)
+        self.loader.start()
+        self.root.after(100, self.poll_loading)
+    
+    def load_worker(self):
+        """Worker thread: sync and load the gallery, reporting progress through self.load_progress"""
+        def progress(done, total):
+            self.load_progress = (done, total)
+        try:
+            self.attendance.load_faces(progress)
+        except Exception as e:
+            self.load_error = str(e)
+    
+    def poll_loading(self):
+        """Show gallery loading progress on the Tk thread until the loader finishes"""
+        if self.loader.is_alive():
+            done, total = self.load_progress
+            self.status_label.config(text=f"Loading faces {done}/{total}...", fg='#e67e22')
+            self.root.after(100, self.poll_loading)
+            return
+        
+        self.loader = None
+        self.add_button.config(state=tk.NORMAL)
+        if self.load_error is not None:
+            self.status_label.config(text=f"Failed to load faces: {self.load_error}", fg='#e74c3c')
+            return
+        self.video_button.config(state=tk.NORMAL)
+        self.status_label.config(text=f"Ready - {len(self.attendance.known_names)} people loaded", fg='#27ae60')
     
     def setup_styles(self):
         """Setup modern styles"""
@@ -154,9 +297,9 @@ class SimpleGUI:
         self.name_entry.pack(side=tk.LEFT)
         
         # Add button
-        add_button = ttk.Button(section_frame, text="Select Photo & Add Person", 
-                               command=self.add_person, style='Green.TButton')
-        add_button.pack(pady=15)
+        self.add_button = ttk.Button(section_frame, text="Select Photo & Add Person", 
+                                    command=self.add_person, style='Green.TButton')
+        self.add_button.pack(pady=15)
     
     def create_attendance_section(self, parent):
         """Create attendance section"""
@@ -173,13 +316,25 @@ class SimpleGUI:
         button_frame = tk.Frame(section_frame, bg='white')
         button_frame.pack(pady=10)
         
-        video_button = ttk.Button(button_frame, text="Process Video File", 
-                                 command=self.select_video, style='Blue.TButton')
-        video_button.pack(side=tk.LEFT, padx=10)
+        self.video_button = ttk.Button(button_frame, text="Process Video File", 
+                                      command=self.select_video, style='Blue.TButton')
+        self.video_button.pack(side=tk.LEFT, padx=10)
         
         manual_button = ttk.Button(button_frame, text="Manual Attendance", 
                                   command=self.manual_attendance, style='Orange.TButton')
         manual_button.pack(side=tk.LEFT, padx=10)
+        
+        # Video controls, enabled while a video is processing
+        control_frame = tk.Frame(section_frame, bg='white')
+        control_frame.pack(pady=(0, 5))
+        
+        self.pause_button = ttk.Button(control_frame, text="Pause", command=self.toggle_pause,
+                                      style='Orange.TButton', state=tk.DISABLED)
+        self.pause_button.pack(side=tk.LEFT, padx=10)
+        
+        self.cancel_button = ttk.Button(control_frame, text="Cancel", command=self.cancel_video,
+                                       style='Red.TButton', state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=10)
     
     def create_status_section(self, parent):
         """Create status and display section"""
@@ -220,10 +375,17 @@ class SimpleGUI:
         
         scrollbar.config(command=self.attendance_text.yview)
         
-        # Refresh button
-        refresh_button = ttk.Button(display_frame, text="Refresh Display", 
-                                   command=self.update_display, style='Blue.TButton')
-        refresh_button.pack(pady=10)
+        # Buttons frame
+        button_frame = tk.Frame(display_frame, bg='white')
+        button_frame.pack(pady=10)
+        
+        refresh_button = ttk.Button(button_frame, text="Refresh Display", 
+                                   command=lambda: self.update_display(redraw=True), style='Blue.TButton')
+        refresh_button.pack(side=tk.LEFT, padx=10)
+        
+        reports_button = ttk.Button(button_frame, text="Reports", 
+                                   command=self.open_reports, style='Orange.TButton')
+        reports_button.pack(side=tk.LEFT, padx=10)
     
     def add_person(self):
         """Add new person"""
@@ -258,162 +420,152 @@ class SimpleGUI:
             self.process_video(file_path)
     
     def process_video(self, video_path):
-        """Process video file for attendance with optimizations"""
-        cap = cv2.VideoCapture(video_path)
-        
-        # Get video properties
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        # Processing settings
-        process_every_n_frames = max(1, int(fps // 5))  # Process 5 frames per second
-        frame_count = 0
-        processed_frames = 0
-        
-        # Track marked attendance to avoid duplicates
-        marked_today = set()
-        today = datetime.now().strftime("%Y-%m-%d")
-        if today in self.attendance.attendance:
-            marked_today = set(self.attendance.attendance[today].keys())
-        
-        self.status_label.config(text="Processing video - Press 'q' to stop", fg='#e67e22')
-        
-        start_time = time.time()
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            
-            # Skip frames for performance
-            if frame_count % process_every_n_frames != 0:
-                continue
-            
-            processed_frames += 1
-            
-            # Resize frame for faster processing (25% of original size)
-            height, width = frame.shape[:2]
-            small_frame = cv2.resize(frame, (width // 4, height // 4))
-            
-            # Recognize faces on small frame
-            face_locations, face_names = self.attendance.recognize_faces(small_frame)
-            
-            # Scale back up face locations for display
-            face_locations = [(top * 4, right * 4, bottom * 4, left * 4) 
-                            for (top, right, bottom, left) in face_locations]
-            
-            # Draw results and mark attendance
-            newly_marked = []
-            for (top, right, bottom, left), name in zip(face_locations, face_names):
-                # Determine color based on attendance status
-                if name == "Unknown":
-                    color = (0, 0, 255)  # Red for unknown
-                elif name in marked_today:
-                    color = (0, 255, 255)  # Yellow for already marked
-                else:
-                    color = (0, 255, 0)  # Green for new
-                
-                # Draw rectangle and name
-                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                
-                # Create label with status
-                if name != "Unknown" and name in marked_today:
-                    label = f"{name} ✓"
-                else:
-                    label = name
-                
-                # Draw label background
-                label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-                cv2.rectangle(frame, (left, top - 25), (left + label_size[0], top), color, -1)
-                cv2.putText(frame, label, (left, top - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
-                
-                # Mark attendance (only once per person)
-                if name != "Unknown" and name not in marked_today:
-                    if self.attendance.mark_attendance(name):
-                        marked_today.add(name)
-                        newly_marked.append(name)
-                        print(f"✓ Attendance marked for {name}")
-            
-            # Calculate progress
-            progress = (frame_count / total_frames) * 100
-            
-            # Draw progress and stats on frame
-            stats_text = [
-                f"Progress: {progress:.1f}%",
-                f"Marked Today: {len(marked_today)}",
-                f"Frame: {frame_count}/{total_frames}"
-            ]
-            
-            if newly_marked:
-                stats_text.append(f"New: {', '.join(newly_marked)}")
-            
-            # Draw stats background
-            y_offset = 30
-            for i, text in enumerate(stats_text):
-                text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-                cv2.rectangle(frame, (10, y_offset + i * 30 - 20), 
-                            (20 + text_size[0], y_offset + i * 30 + 5), (0, 0, 0), -1)
-                cv2.putText(frame, text, (15, y_offset + i * 30), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Draw progress bar
-            bar_width = 400
-            bar_height = 20
-            bar_x = width - bar_width - 20
-            bar_y = 20
-            
-            # Progress bar background
-            cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height), (50, 50, 50), -1)
-            
-            # Progress bar fill
-            fill_width = int((progress / 100) * bar_width)
-            cv2.rectangle(frame, (bar_x, bar_y), (bar_x + fill_width, bar_y + bar_height), (0, 255, 0), -1)
-            
-            # Progress text
-            cv2.putText(frame, f"{progress:.1f}%", (bar_x + bar_width // 2 - 30, bar_y + 15), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            
-            cv2.imshow('Video Attendance - Enhanced', frame)
-            
-            # Update GUI periodically
-            if processed_frames % 10 == 0:
-                self.root.after(0, self.update_display)
-                self.root.after(0, lambda: self.status_label.config(
-                    text=f"Processing: {progress:.1f}% - {len(marked_today)} marked", fg='#e67e22'))
+        """Process a video file on a background thread, keeping the window responsive"""
+        if self.pipeline is not None:
+            return
+        from pipeline import VideoPipeline
+        
+        def show_frame(result):
+            # Runs on the worker thread: hand results to the Tk loop, never touch widgets
+            if self.preview_window is not None:
+                height, width = result.frame.shape[:2]
+                preview = cv2.resize(result.frame, (480, 480 * height // width))
+                ok, png = cv2.imencode('.png', preview, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+                if ok:
+                    self.preview_data = base64.b64encode(png.tobytes())
+            self.events.put(("progress", pipeline.progress(result.index), len(pipeline.marked_today),
+                             bool(result.newly_marked)))
             
-            # Check for quit (faster response)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            # Block here while paused; the pipeline stops decoding once its slots are full
+            self.unpaused.wait()
+        
+        pipeline = VideoPipeline(self.attendance, on_frame=show_frame, metrics=self.attendance.metrics)
+        self.pipeline = pipeline
+        self.stopping = False
+        self.unpaused.set()
+        self.open_preview()
+        # The worker thread matches against the gallery, so it can't change under it
+        self.add_button.config(state=tk.DISABLED)
+        self.video_button.config(state=tk.DISABLED)
+        self.pause_button.config(state=tk.NORMAL, text="Pause")
+        self.cancel_button.config(state=tk.NORMAL)
+        self.status_label.config(text="Processing video - press 'q' in the preview or Cancel to stop", fg='#e67e22')
+        
+        self.worker = threading.Thread(target=self.video_worker, args=(pipeline, video_path), daemon=True)
+        self.worker.start()
+        self.root.after(50, self.poll_events)
+    
+    def video_worker(self, pipeline, video_path):
+        """Worker thread: run the pipeline and post its outcome"""
+        try:
+            self.events.put(("done", pipeline.run(video_path)))
+        except Exception as e:
+            self.events.put(("error", str(e)))
+    
+    def poll_events(self):
+        """Apply worker events on the Tk thread, then poll again until the run ends"""
+        refresh, progress, finished = False, None, None
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
                 break
+            if event[0] == "progress":
+                progress = event
+                refresh = refresh or event[3]
+            else:
+                finished = event
         
-        # Cleanup
-        cap.release()
-        cv2.destroyAllWindows()
-        
-        # Calculate processing time and stats
-        processing_time = time.time() - start_time
-        fps_processed = processed_frames / processing_time if processing_time > 0 else 0
-        
-        # Show completion summary
-        summary = f"""Video Processing Complete!
-        
-Processing Time: {processing_time:.1f} seconds
-Processed Frames: {processed_frames}/{total_frames}
-Average FPS: {fps_processed:.1f}
-People Marked: {len(marked_today)}
+        if progress is not None and not self.stopping:
+            state = "Paused" if not self.unpaused.is_set() else "Processing"
+            self.status_label.config(text=f"{state}: {progress[1]:.1f}% - {progress[2]} marked", fg='#e67e22')
+        if refresh:
+            self.update_display()
+        self.show_preview()
         
-Performance: {3 if fps_processed > 5 else 2 if fps_processed > 2 else 1}x faster than real-time"""
+        if finished is None:
+            self.root.after(50, self.poll_events)
+        else:
+            self.video_finished(*finished)
+    
+    def video_finished(self, kind, payload):
+        """Reset the controls and report the run"""
+        self.pipeline = None
+        self.close_preview()
+        self.add_button.config(state=tk.NORMAL)
+        self.video_button.config(state=tk.NORMAL)
+        self.pause_button.config(state=tk.DISABLED, text="Pause")
+        self.cancel_button.config(state=tk.DISABLED)
+        self.update_display()
         
-        messagebox.showinfo("Processing Complete", summary)
+        if kind == "error":
+            messagebox.showerror("Error", payload)
+            self.status_label.config(text="Ready", fg='#27ae60')
+            return
         
-        # Update status and display
-        self.status_label.config(text=f"Processing complete - {len(marked_today)} people marked", fg='#27ae60')
-        self.update_display()
+        from pipeline import format_summary
+        messagebox.showinfo("Processing Complete", "Video Processing Complete!\n\n" + format_summary(payload))
+        self.status_label.config(text=f"Processing complete - {len(payload['marked'])} people marked", fg='#27ae60')
+    
+    def toggle_pause(self):
+        """Pause or resume the running video"""
+        if self.pipeline is None:
+            return
+        if self.unpaused.is_set():
+            self.unpaused.clear()
+            self.pause_button.config(text="Resume")
+            self.status_label.config(text="Paused", fg='#e67e22')
+        else:
+            self.unpaused.set()
+            self.pause_button.config(text="Pause")
+    
+    def cancel_video(self):
+        """Stop the running video after the frame in progress"""
+        if self.pipeline is None:
+            return
+        self.stopping = True
+        self.pipeline.stop()
+        self.unpaused.set()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.pause_button.config(state=tk.DISABLED)
+        self.status_label.config(text="Stopping...", fg='#e67e22')
+    
+    def open_preview(self):
+        """Preview window for the annotated frames (OpenCV windows are not thread-safe)"""
+        self.preview_window = tk.Toplevel(self.root)
+        self.preview_window.title("Video Attendance - Enhanced")
+        self.preview_window.protocol("WM_DELETE_WINDOW", self.cancel_video)
+        self.preview_window.bind('<q>', lambda event: self.cancel_video())
+        self.preview_label = tk.Label(self.preview_window, bg='black')
+        self.preview_label.pack()
+    
+    def show_preview(self):
+        """Show the newest preview frame, skipping any the GUI had no time for"""
+        data, self.preview_data = self.preview_data, None
+        if data is not None and self.preview_window is not None:
+            self.preview_image = tk.PhotoImage(data=data)
+            self.preview_label.config(image=self.preview_image)
+    
+    def close_preview(self):
+        if self.preview_window is not None:
+            self.preview_window.destroy()
+            self.preview_window = None
+            self.preview_image = None
+    
+    def on_close(self):
+        """Stop a running video before closing the window"""
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.unpaused.set()
+            # Let the worker shut its process pool down
+            self.worker.join(timeout=5)
+        self.root.destroy()
     
     def manual_attendance(self):
         """Manual attendance marking"""
-        if not self.attendance.known_names:
+        # Names come from the gallery files, so this works before the encodings have loaded
+        names = self.attendance.store.names()
+        if not names:
             messagebox.showwarning("Warning", "No registered faces found!")
             return
         
@@ -458,7 +610,7 @@ Performance: {3 if fps_processed > 5 else 2 if fps_processed > 2 else 1}x faster
         if today in self.attendance.attendance:
             marked_today = set(self.attendance.attendance[today].keys())
         
-        for name in sorted(self.attendance.known_names):
+        for name in names:
             display_name = f"{name} ✓" if name in marked_today else name
             listbox.insert(tk.END, display_name)
         
@@ -490,21 +642,153 @@ Performance: {3 if fps_processed > 5 else 2 if fps_processed > 2 else 1}x faster
                                  command=selection_window.destroy, style='Red.TButton')
         cancel_button.pack(side=tk.LEFT, padx=10)
     
-    def update_display(self):
-        """Update attendance display"""
-        self.attendance_text.delete(1.0, tk.END)
+    def open_reports(self):
+        """Attendance rates, absences and CSV export over any date range"""
+        reports = AttendanceReports(self.attendance.records, self.attendance.store.names())
+        current = {"rows": [], "columns": RATE_COLUMNS}
+        
+        report_window = tk.Toplevel(self.root)
+        report_window.title("Attendance Reports")
+        report_window.geometry("560x520")
+        report_window.configure(bg='#f0f0f0')
+        
+        main_frame = tk.Frame(report_window, bg='#f0f0f0')
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        
+        # Date range, the last week by default
+        range_frame = tk.Frame(main_frame, bg='#f0f0f0')
+        range_frame.pack(pady=(0, 10))
+        today = datetime.now()
+        tk.Label(range_frame, text="From:", font=("Arial", 11), bg='#f0f0f0').pack(side=tk.LEFT, padx=(0, 5))
+        start_entry = tk.Entry(range_frame, font=("Arial", 11), width=11, relief='solid', bd=1)
+        start_entry.insert(0, (today - timedelta(days=6)).strftime("%Y-%m-%d"))
+        start_entry.pack(side=tk.LEFT, padx=(0, 15))
+        tk.Label(range_frame, text="To:", font=("Arial", 11), bg='#f0f0f0').pack(side=tk.LEFT, padx=(0, 5))
+        end_entry = tk.Entry(range_frame, font=("Arial", 11), width=11, relief='solid', bd=1)
+        end_entry.insert(0, today.strftime("%Y-%m-%d"))
+        end_entry.pack(side=tk.LEFT)
+        
+        # Results table with scrollbar
+        table_frame = tk.Frame(main_frame, bg='white', relief='solid', bd=1)
+        table_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        scrollbar = tk.Scrollbar(table_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        table = ttk.Treeview(table_frame, show='headings', yscrollcommand=scrollbar.set)
+        table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=table.yview)
+        
+        summary_label = tk.Label(main_frame, text="Double-click a person for their history",
+                                 font=("Arial", 10), bg='#f0f0f0', fg='#2c3e50')
+        summary_label.pack()
+        
+        def date_range():
+            try:
+                return parse_date(start_entry.get().strip()), parse_date(end_entry.get().strip())
+            except Exception as e:
+                messagebox.showerror("Error", str(e), parent=report_window)
+                return None
+        
+        def show(rows, columns):
+            current["rows"], current["columns"] = rows, columns
+            table.delete(*table.get_children())
+            table.config(columns=columns)
+            for column in columns:
+                table.heading(column, text=column.replace("_", " ").title())
+                table.column(column, width=100)
+            for row in rows:
+                values = [f"{row[c]:.0%}" if c == "rate" else row[c] for c in columns]
+                table.insert("", tk.END, values=values)
+        
+        def show_rates():
+            dates = date_range()
+            if dates:
+                rows = reports.rates(*dates)
+                show(rows, RATE_COLUMNS)
+                days = rows[0]["days"] if rows else 0
+                summary_label.config(text=f"{len(rows)} people over {days} attendance days")
+        
+        def show_absent():
+            dates = date_range()
+            if dates:
+                rows = [{"name": name} for name in reports.absent(*dates)]
+                show(rows, ("name",))
+                summary_label.config(text=f"{len(rows)} people absent on every day")
+        
+        def show_marks():
+            dates = date_range()
+            if dates:
+                rows = reports.marks(*dates)
+                show(rows, MARK_COLUMNS)
+                summary_label.config(text=f"{len(rows)} marks")
+        
+        def show_person(event):
+            selection = table.selection()
+            dates = date_range()
+            if not selection or not dates or "name" not in current["columns"]:
+                return
+            name = table.set(selection[0], "name")
+            person = reports.person(name, *dates)
+            history = "\n".join(f"{date}  {time}" for date, time in person["marks"][-15:])
+            messagebox.showinfo(name, f"Present {person['present']} of {person['days']} days "
+                                      f"({person['rate']:.0%})\n\n{history}", parent=report_window)
+        
+        def export():
+            path = filedialog.asksaveasfilename(parent=report_window, defaultextension=".csv",
+                                                filetypes=[("CSV files", "*.csv")])
+            if path:
+                export_csv(current["rows"], current["columns"], path)
+                self.status_label.config(text=f"Exported {len(current['rows'])} rows to {os.path.basename(path)}",
+                                         fg='#27ae60')
+        
+        table.bind('<Double-1>', show_person)
+        
+        # Buttons frame
+        button_frame = tk.Frame(main_frame, bg='#f0f0f0')
+        button_frame.pack(pady=(10, 0))
+        ttk.Button(button_frame, text="Rates", command=show_rates, style='Blue.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Absent", command=show_absent, style='Orange.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="All Marks", command=show_marks, style='Blue.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Export CSV", command=export, style='Green.TButton').pack(side=tk.LEFT, padx=5)
         
+        show_rates()
+    
+    def update_display(self, redraw=False):
+        """Update attendance display, appending rows only for newly marked people"""
         today = datetime.now().strftime("%Y-%m-%d")
+        # Copy, since the video worker thread may be adding marks
+        marks = dict(self.attendance.attendance.get(today, {}))
         
-        if today in self.attendance.attendance:
+        if redraw or today != self.displayed_date or not self.displayed:
+            self.redraw_display(today, marks)
+            return
+        
+        new = [name for name in marks if name not in self.displayed]
+        if not new:
+            return
+        for name in new:
+            self.attendance_text.insert("footer.first", f"{name:<20} - {marks[name]}\n")
+            self.displayed.add(name)
+        
+        start = self.attendance_text.index("total.first")
+        self.attendance_text.delete(start, "total.last")
+        self.attendance_text.insert(start, f"Total Present: {len(self.displayed)}\n", ("footer", "total"))
+    
+    def redraw_display(self, today, marks):
+        """Rewrite the whole attendance display"""
+        self.attendance_text.delete(1.0, tk.END)
+        self.displayed_date = today
+        self.displayed = set(marks)
+        
+        if marks:
             self.attendance_text.insert(tk.END, f"Date: {today}\n")
             self.attendance_text.insert(tk.END, "-" * 40 + "\n")
             
-            for name, time in self.attendance.attendance[today].items():
+            for name, time in marks.items():
                 self.attendance_text.insert(tk.END, f"{name:<20} - {time}\n")
-                
-            self.attendance_text.insert(tk.END, "-" * 40 + "\n")
-            self.attendance_text.insert(tk.END, f"Total Present: {len(self.attendance.attendance[today])}\n")
+            
+            # New rows are inserted in front of the footer
+            self.attendance_text.insert(tk.END, "-" * 40 + "\n", "footer")
+            self.attendance_text.insert(tk.END, f"Total Present: {len(marks)}\n", ("footer", "total"))
         else:
             self.attendance_text.insert(tk.END, "No attendance recorded for today")
     
@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import threading
+
+# Open bounds for date-range queries; dates are stored as YYYY-MM-DD text
+FIRST_DATE, LAST_DATE = "0000-00-00", "9999-99-99"
+
+class AttendanceStore:
+    """Append-only attendance journal in SQLite (WAL mode).
+
+    Each mark is one INSERT in its own transaction, so a crash can lose at
+    most the mark being written and never corrupts earlier history. Marks
+    are unique per (date, name) and indexed by date, so loading one day is
+    an index range scan no matter how many years are stored. A second index
+    on (name, date) makes one person's history a range scan too. Triggers
+    keep two rollups current: days (one row per day with any marks) and
+    months (days present per person per month), so counting attendance
+    over a long range reads one row per person-month plus the raw marks of
+    the two partial months at its ends. The WAL is checkpointed every
+    checkpoint_every marks and on close to keep it from growing. Rows are
+    never deleted, so the file has no free pages to VACUUM away.
+    """
+
+    def __init__(self, path="attendance.db", checkpoint_every=500):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self._since_checkpoint = 0
+        self._lock = threading.Lock()
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS marks (
+                id INTEGER PRIMARY KEY,
+                date TEXT NOT NULL,
+                name TEXT NOT NULL,
+                time TEXT NOT NULL,
+                UNIQUE (date, name))""")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS imports (
+                source TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL)""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS marks_by_name ON marks (name, date)")
+            has_rollups = self.db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'months'").fetchone()
+            self.db.execute("""CREATE TABLE IF NOT EXISTS days (
+                date TEXT PRIMARY KEY,
+                present INTEGER NOT NULL) WITHOUT ROWID""")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS months (
+                month TEXT NOT NULL,
+                name TEXT NOT NULL,
+                present INTEGER NOT NULL,
+                last TEXT NOT NULL,
+                PRIMARY KEY (month, name)) WITHOUT ROWID""")
+            self.db.execute("""CREATE TRIGGER IF NOT EXISTS rollup_mark AFTER INSERT ON marks BEGIN
+                INSERT OR IGNORE INTO days (date, present) VALUES (NEW.date, 0);
+                UPDATE days SET present = present + 1 WHERE date = NEW.date;
+                INSERT OR IGNORE INTO months (month, name, present, last)
+                    VALUES (substr(NEW.date, 1, 7), NEW.name, 0, NEW.date);
+                UPDATE months SET present = present + 1, last = max(last, NEW.date)
+                    WHERE month = substr(NEW.date, 1, 7) AND name = NEW.name;
+            END""")
+            if not has_rollups:
+                # Databases from before the rollups: fill them in once
+                self.db.execute("INSERT INTO days SELECT date, COUNT(*) FROM marks GROUP BY date")
+                self.db.execute("INSERT INTO months SELECT substr(date, 1, 7), name, COUNT(*), MAX(date) "
+                                "FROM marks GROUP BY 1, 2")
+
+    def mark(self, date, name, time):
+        """Record a mark; returns False if the person was already marked that day"""
+        with self._lock, self.db:
+            cursor = self.db.execute("INSERT OR IGNORE INTO marks (date, name, time) VALUES (?, ?, ?)",
+                                     (date, name, time))
+            added = cursor.rowcount == 1
+        if added:
+            self._since_checkpoint += 1
+            if self._since_checkpoint >= self.checkpoint_every:
+                self.checkpoint()
+        return added
+
+    def day(self, date):
+        """All marks of one day as {name: time}, in marking order"""
+        with self._lock:
+            rows = self.db.execute("SELECT name, time FROM marks WHERE date = ? ORDER BY id",
+                                   (date,)).fetchall()
+        return dict(rows)
+
+    def all(self):
+        """Full history as {date: {name: time}}"""
+        history = {}
+        with self._lock:
+            for date, name, time in self.db.execute("SELECT date, name, time FROM marks ORDER BY date, id"):
+                history.setdefault(date, {})[name] = time
+        return history
+
+    def days(self, start=None, end=None):
+        """Days with any marks in [start, end] as [(date, people present)], oldest first"""
+        with self._lock:
+            return self.db.execute("SELECT date, present FROM days WHERE date BETWEEN ? AND ? ORDER BY date",
+                                   (start or FIRST_DATE, end or LAST_DATE)).fetchall()
+
+    def day_count(self, start=None, end=None):
+        """Number of days with any marks in [start, end]"""
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM days WHERE date BETWEEN ? AND ?",
+                                   (start or FIRST_DATE, end or LAST_DATE)).fetchone()[0]
+
+    def person(self, name, start=None, end=None):
+        """One person's marks in [start, end] as [(date, time)], oldest first"""
+        with self._lock:
+            return self.db.execute("SELECT date, time FROM marks WHERE name = ? AND date BETWEEN ? AND ? "
+                                   "ORDER BY date", (name, start or FIRST_DATE, end or LAST_DATE)).fetchall()
+
+    def presence(self, start=None, end=None):
+        """{name: (days present, last date present)} for everyone marked in [start, end]"""
+        start, end = start or FIRST_DATE, end or LAST_DATE
+        # Whole months in between come from the rollup, the partial months at both ends from the marks
+        head_end = min(end, start[:7] + "-99")
+        tail_start = max(start[:7] + "-99", end[:7] + "-00")
+        with self._lock:
+            rows = self.db.execute("""SELECT name, SUM(present), MAX(last) FROM (
+                    SELECT name, present, last FROM months WHERE month > ? AND month < ?
+                    UNION ALL
+                    SELECT name, 1, date FROM marks WHERE date BETWEEN ? AND ?
+                    UNION ALL
+                    SELECT name, 1, date FROM marks WHERE date BETWEEN ? AND ?)
+                GROUP BY name""", (start[:7], end[:7], start, head_end, tail_start, end))
+            return {name: (count, last) for name, count, last in rows}
+
+    def marks(self, start=None, end=None):
+        """All marks in [start, end] as [(date, name, time)], by date and marking order"""
+        with self._lock:
+            return self.db.execute("SELECT date, name, time FROM marks WHERE date BETWEEN ? AND ? "
+                                   "ORDER BY date, id", (start or FIRST_DATE, end or LAST_DATE)).fetchall()
+
+    def import_json(self, path):
+        """Import an attendance.json file once; returns the number of new marks"""
+        st = os.stat(path)
+        with self._lock:
+            seen = self.db.execute("SELECT size, mtime FROM imports WHERE source = ?",
+                                   (os.path.abspath(path),)).fetchone()
+        if seen == (st.st_size, st.st_mtime):
+            return 0
+
+        with open(path) as f:
+            history = json.load(f)
+        rows = [(date, name, time) for date, marks in sorted(history.items())
+                for name, time in marks.items()]
+
+        with self._lock, self.db:
+            # rowcount counts only rows inserted into marks, not the rollup trigger's writes
+            added = self.db.executemany("INSERT OR IGNORE INTO marks (date, name, time) VALUES (?, ?, ?)",
+                                        rows).rowcount
+            self.db.execute("INSERT OR REPLACE INTO imports (source, size, mtime) VALUES (?, ?, ?)",
+                            (os.path.abspath(path), st.st_size, st.st_mtime))
+        return added
+
+    def checkpoint(self):
+        """Fold the write-ahead log back into the database file"""
+        with self._lock:
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._since_checkpoint = 0
+
+    def close(self):
+        self.checkpoint()
+        self.db.close()
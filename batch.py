@@ -0,0 +1,195 @@
+"""Headless batch attendance over many video files
+
+Examples:
+    python batch.py recordings/2024-01-15/ --date 2024-01-15
+    python batch.py "recordings/*.mp4" --jobs 4 --report report.json
+    python batch.py hall.mp4 --roi 0,0,1,0.35 --roi 0.8,0.2,0.2,0.6   # back rows and door at full resolution
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from matcher import DEFAULT_TOLERANCE, FaceMatcher
+from pipeline import VideoPipeline
+from regions import parse_roi
+from reports import parse_date
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+_matcher = None
+
+
+class FileAttendance:
+    """Recognition core for one video: shares the gallery, records marks in memory.
+
+    Marks are provisional until run_batch merges them into the real store,
+    which is where they are announced.
+    """
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.attendance = {}
+        self.marked = []
+
+    def mark_attendance(self, name):
+        if name in self.marked:
+            return False
+        self.marked.append(name)
+        return True
+
+
+def find_videos(inputs):
+    """Expand directories and glob patterns into a sorted list of video files"""
+    videos = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                videos.update(os.path.join(root, f) for f in files if f.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.update(p for p in glob.glob(item) if p.lower().endswith(VIDEO_EXTENSIONS))
+    return sorted(videos)
+
+
+def _init_worker(encodings, names, tolerance):
+    global _matcher
+    # The rows are the parent's prototypes already; don't cluster them again
+    _matcher = FaceMatcher(tolerance, max_prototypes=None)
+    _matcher.set(encodings, names)
+
+
+def process_file(video_path, sample_fps=5, scale=4, tracking=False, adaptive=False, stop_early=False,
+                 multiscale=False, rois=None, decoder="opencv", quality=True):
+    """Worker: run one video through an in-process pipeline and report on it"""
+    start = time.perf_counter()
+    report = {"file": video_path}
+    try:
+        recorder = FileAttendance(_matcher)
+        pipeline = VideoPipeline(recorder, workers=0, sample_fps=sample_fps, scale=scale,
+                                 render=False, announce=False, tracking=tracking, adaptive=adaptive,
+                                 expected=_matcher.identities if stop_early else None,
+                                 multiscale=multiscale, rois=rois, decoder=decoder, quality=quality)
+        summary = pipeline.run(video_path)
+        report.update(
+            frames_read=summary["frames_read"],
+            frames_decoded=summary["frames_decoded"],
+            frames_skipped=summary["frames_skipped"],
+            frames_processed=summary["processed_frames"],
+            faces_seen=summary["faces_seen"],
+            people=recorder.marked,
+        )
+        if tracking:
+            report["encoder_calls_saved"] = summary["tracking"]["encoder_calls_saved"]
+        if "multiscale" in summary:
+            report["detector_pixel_share"] = summary["multiscale"]["pixel_share"]
+            report["faces_found_at_full_res"] = summary["multiscale"]["extra_faces"]
+        if "quality" in summary:
+            report["faces_skipped"] = {reason: n for reason, n in summary["quality"]["skipped"].items() if n}
+    except Exception as e:
+        report["error"] = str(e)
+    report["wall_time"] = time.perf_counter() - start
+    return report
+
+
+def mark(attendance, date, name):
+    """Record one merged mark under date; False if the person was already marked that day"""
+    marked_at = datetime.now().strftime("%H:%M")
+    if not attendance.records.mark(date, name, marked_at):
+        return False
+    if date in attendance.attendance:
+        attendance.attendance[date][name] = marked_at
+    return True
+
+
+def run_batch(attendance, videos, jobs=None, sample_fps=5, scale=4, tracking=False,
+              adaptive=False, stop_early=False, multiscale=False, rois=None, decoder="opencv",
+              quality=True, date=None):
+    """Process videos in parallel and merge everyone seen into attendance.
+
+    Marks are filed under date (YYYY-MM-DD, default today), so recordings
+    of an earlier day can be processed later.
+    """
+    date = date or datetime.now().strftime("%Y-%m-%d")
+    encodings, names = attendance.matcher.encodings.copy(), list(attendance.matcher.names)
+    reports = []
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(encodings, names, attendance.matcher.tolerance)) as pool:
+        futures = [pool.submit(process_file, video, sample_fps, scale, tracking, adaptive, stop_early,
+                               multiscale, rois, decoder, quality) for video in videos]
+        for future in as_completed(futures):
+            report = future.result()
+            report["marked"] = [name for name in report.get("people", [])
+                                if mark(attendance, date, name)]
+            reports.append(report)
+
+            if "error" in report:
+                print(f"✗ {report['file']}: {report['error']}")
+            else:
+                print(f"✓ {report['file']}: {report['frames_processed']} frames, "
+                      f"{report['faces_seen']} faces, {len(report['marked'])} marked "
+                      f"({report['wall_time']:.1f}s)")
+            for name in report["marked"]:
+                print(f"✓ Attendance marked for {name}")
+
+    reports.sort(key=lambda r: r["file"])
+    return reports
+
+
+def main():
+    from attendance import SimpleAttendance
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.splitlines()[2:]))
+    parser.add_argument("inputs", nargs="+", help="video files, directories or glob patterns")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel videos (default: CPU count)")
+    parser.add_argument("--sample-fps", type=float, default=5, help="frames analyzed per second of video")
+    parser.add_argument("--scale", type=int, default=4, help="downscale factor before detection")
+    parser.add_argument("--tracking", action="store_true",
+                        help="detect on keyframes only and track faces in between")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="sample sparsely while the scene is static (frames are analyzed one "
+                             "at a time in the video's own process, so feedback is never stale)")
+    parser.add_argument("--stop-early", action="store_true",
+                        help="stop a video once every registered person has been marked")
+    parser.add_argument("--multiscale", action="store_true",
+                        help="re-detect faces at full resolution and encode from the full frame")
+    parser.add_argument("--roi", type=parse_roi, action="append",
+                        help="x,y,w,h (fractions of the frame) searched at full resolution; repeatable")
+    parser.add_argument("--decoder", choices=("opencv", "ffmpeg"), default="opencv",
+                        help="ffmpeg: decode straight to the detection size (needs the ffmpeg binary)")
+    parser.add_argument("--no-quality", action="store_true",
+                        help="encode every detected face, even tiny, blurred or profile ones")
+    parser.add_argument("--date", type=parse_date, default=None,
+                        help="day to file the marks under, YYYY-MM-DD (default: today)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--report", default="batch_report.json", help="per-file report (JSON)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        parser.error("no video files found")
+
+    attendance = SimpleAttendance(tolerance=args.tolerance)
+    print(f"Processing {len(videos)} videos...")
+    start = time.perf_counter()
+    reports = run_batch(attendance, videos, args.jobs, args.sample_fps, args.scale,
+                        args.tracking, args.adaptive, args.stop_early, args.multiscale, args.roi,
+                        args.decoder, not args.no_quality, args.date)
+    elapsed = time.perf_counter() - start
+
+    with open(args.report, "w") as f:
+        json.dump(reports, f, indent=2)
+
+    marked = sum(len(r["marked"]) for r in reports)
+    failed = sum(1 for r in reports if "error" in r)
+    print(f"\nDone in {elapsed:.1f}s: {len(reports) - failed} videos processed, "
+          f"{failed} failed, {marked} people marked. Report: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
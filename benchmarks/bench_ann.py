@@ -0,0 +1,79 @@
+"""Recall vs latency of the IVF index against exact FaceMatcher search
+
+Run from the project root:  python benchmarks/bench_ann.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import IVFIndex
+from bench_matching import synthetic_gallery
+from matcher import FaceMatcher
+
+
+def clustered_gallery(size, clusters=2000, seed=0):
+    """Encodings drawn around shared centres, closer to real face data than iid noise"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.09, (clusters, 128)).astype(np.float32)
+    encodings = centres[rng.integers(0, clusters, size)] + rng.normal(0, 0.04, (size, 128)).astype(np.float32)
+    return encodings, [f"person_{i}" for i in range(size)]
+
+
+def timed_matches(matcher, queries, faces_per_frame):
+    """Match queries a frame at a time; returns (matches, ms per frame)"""
+    matcher.match(queries[:1])
+    matches = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), faces_per_frame):
+        matches.extend(matcher.match(queries[i:i + faces_per_frame]))
+    frames = -(-len(queries) // faces_per_frame)
+    return matches, (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, nargs="+", default=[256, 1024])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--faces", type=int, default=5, help="faces per frame")
+    parser.add_argument("--noise", type=float, default=0.3,
+                        help="distance between a query and its gallery photo")
+    parser.add_argument("--iid", action="store_true", help="use unclustered random encodings")
+    args = parser.parse_args()
+
+    encodings, names = (synthetic_gallery if args.iid else clustered_gallery)(args.size)
+    rng = np.random.default_rng(1)
+    queries = encodings[rng.integers(0, args.size, args.queries)]
+    queries = queries + rng.normal(0, args.noise / np.sqrt(128), queries.shape).astype(np.float32)
+
+    exact = FaceMatcher()
+    exact.set(encodings, names)
+    truth, exact_ms = timed_matches(exact, queries, args.faces)
+    truth = [m.name for m in truth]
+    print(f"gallery={args.size} queries={args.queries} faces/frame={args.faces}")
+    print(f"{'exact':>14} {'':>10} recall=1.000  {exact_ms:8.3f} ms/frame")
+
+    for nlist in args.nlist:
+        index = IVFIndex(nlist=nlist)
+        matcher = FaceMatcher(index=index)
+        start = time.perf_counter()
+        matcher.set(encodings, names)
+        build = time.perf_counter() - start
+        print(f"IVF nlist={nlist}: built in {build:.1f}s")
+
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            matches, elapsed_ms = timed_matches(matcher, queries, args.faces)
+            recall = np.mean([m.name == t for m, t in zip(matches, truth)])
+            print(f"{'':>14} nprobe={nprobe:<3} recall={recall:.3f}  {elapsed_ms:8.3f} ms/frame"
+                  f"  ({exact_ms / elapsed_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
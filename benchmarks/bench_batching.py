@@ -0,0 +1,80 @@
+"""Per-frame vs batched face detection + encoding throughput on CPU
+
+Run from the project root:
+    python benchmarks/bench_batching.py                    # frames from fixtures/face.jpg
+    python benchmarks/bench_batching.py --video lecture.mp4 --model cnn
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from pipeline import find_and_encode
+
+
+def load_frames(video, image, count, scale):
+    """RGB frames from a video, or shifted copies of one image"""
+    frames = []
+    if video:
+        cap = cv2.VideoCapture(video)
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    else:
+        base = cv2.imread(image)
+        if base is None:
+            raise SystemExit(f"Cannot read image: {image}")
+        # Enlarge to a 720p-sized frame so the face survives the downscale
+        base = cv2.resize(base, (base.shape[1] * 720 // base.shape[0], 720))
+        for i in range(count):
+            # Small shifts so every frame is a distinct array
+            frames.append(np.roll(base, (i % 3, i % 5), axis=(0, 1)))
+    if not frames:
+        raise SystemExit("No frames to benchmark")
+
+    height, width = frames[0].shape[:2]
+    return [cv2.resize(f, (width // scale, height // scale))[:, :, ::-1].copy() for f in frames]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", help="take frames from this video")
+    parser.add_argument("--image", default=os.path.join(BENCH_DIR, "fixtures", "face.jpg"),
+                        help="image with a face")
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--scale", type=int, default=4, help="downscale factor, as in process_video")
+    parser.add_argument("--model", choices=("hog", "cnn"), default="hog")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.image, args.frames, args.scale)
+    locations, _ = find_and_encode(frames, args.model, len(frames))  # also loads models before timing
+    if not any(locations):
+        raise SystemExit("✗ No faces in the frames: only detection would be timed, never encoding")
+
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, {args.model} detector")
+    print(f"{'batch':>6} {'frames/sec':>11} {'faces':>6} {'speedup':>8}")
+    baseline = None
+    for batch_size in args.batch_sizes:
+        faces = 0
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            _, encodings = find_and_encode(frames[i:i + batch_size], args.model, batch_size)
+            faces += sum(len(e) for e in encodings)
+        fps = len(frames) / (time.perf_counter() - start)
+        baseline = baseline or fps
+        print(f"{batch_size:>6} {fps:>11.1f} {faces:>6} {fps / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
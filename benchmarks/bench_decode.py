@@ -0,0 +1,148 @@
+"""Decode-only throughput: how fast frames reach the workers, without any face detection
+
+Compares plain cv2.VideoCapture + resize, the threaded/hardware FFmpeg
+capture, grab()-skipping at the sampling stride, ffmpeg decoding straight
+to 1/scale (if the ffmpeg binary is installed), and the cost of handing a
+frame to a worker by pickling vs. through the shared-memory ring.
+
+Run from the project root:
+    python benchmarks/bench_decode.py                   # clip generated from demo_image.png
+    python benchmarks/bench_decode.py --video lecture.mp4 --scale 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [ROOT, BENCH_DIR]
+
+from bench_suite import write_clip
+from decode import FFmpegCapture, FrameRing, open_capture
+
+
+def drain(cap, scale, limit, stride=1):
+    """Decode (and downscale) up to limit frames; returns frames/sec of video covered"""
+    frames, start = 0, time.perf_counter()
+    while frames < limit:
+        for _ in range(stride - 1):
+            if not cap.grab():
+                break
+            frames += 1
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames += 1
+        if scale > 1:
+            height, width = frame.shape[:2]
+            cv2.resize(frame, (width // scale, height // scale))
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return frames / elapsed if elapsed > 0 else 0.0, frames
+
+
+_ring = None
+
+
+def _attach(spec):
+    global _ring
+    _ring = FrameRing.attach(*spec)
+
+
+def _touch(item):
+    """Worker: read the frame the way detect_and_encode does (an RGB copy)"""
+    frame = _ring.slot(item) if isinstance(item, int) else item
+    return int(frame[:, :, ::-1].copy()[0, 0, 0])
+
+
+def handoff(shape, repeat=200):
+    """Microseconds per frame to get frames into a worker process: pickled vs. shared ring"""
+    frame = np.random.default_rng(0).integers(0, 255, shape, dtype=np.uint8)
+    ring = FrameRing(8, shape)
+    # Bound frames in flight by the slot count, as the pipeline's semaphore does
+    in_flight = threading.Semaphore(ring.slots)
+
+    def pickled_frames():
+        for _ in range(repeat):
+            in_flight.acquire()
+            yield frame
+
+    def ring_slots():
+        for i in range(repeat):
+            in_flight.acquire()
+            np.copyto(ring.slot(i), frame)
+            yield i % ring.slots
+
+    results = []
+    try:
+        with multiprocessing.Pool(1, initializer=_attach, initargs=(ring.spec,)) as pool:
+            pool.map(_touch, [0])
+            for items in (pickled_frames(), ring_slots()):
+                start = time.perf_counter()
+                for _ in pool.imap(_touch, items):
+                    in_flight.release()
+                results.append((time.perf_counter() - start) / repeat * 1e6)
+    finally:
+        ring.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.splitlines()[2:]))
+    parser.add_argument("--video", help="video to decode (default: a clip generated from --image)")
+    parser.add_argument("--image", default=os.path.join(ROOT, "demo_image.png"))
+    parser.add_argument("--frames", type=int, default=1000, help="decode at most this many frames")
+    parser.add_argument("--scale", type=int, default=4, help="downscale factor, as in process_video")
+    parser.add_argument("--sample-fps", type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workspace:
+        video = args.video
+        if not video:
+            image = cv2.imread(args.image)
+            if image is None:
+                raise SystemExit(f"Cannot read image: {args.image}")
+            video = write_clip(image, os.path.join(workspace, "reference.avi"), seconds=20)
+
+        probe = cv2.VideoCapture(video)
+        fps = probe.get(cv2.CAP_PROP_FPS) or 25
+        shape = (int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(probe.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+        probe.release()
+        stride = max(1, int(fps // args.sample_fps))
+
+        modes = [
+            ("cv2.VideoCapture + resize", lambda: drain(cv2.VideoCapture(video), args.scale, args.frames)),
+            ("FFmpeg threads + hw + resize", lambda: drain(open_capture(video), args.scale, args.frames)),
+            (f"  + grab() skipping (1 in {stride})",
+             lambda: drain(open_capture(video), args.scale, args.frames, stride)),
+        ]
+        if FFmpegCapture.available():
+            modes.append((f"ffmpeg decoding to 1/{args.scale}",
+                          lambda: drain(FFmpegCapture(video, args.scale), 1, args.frames)))
+        else:
+            print("(ffmpeg not on PATH: skipping the reduced-resolution decoder)")
+
+        print(f"{os.path.basename(video)}: {shape[1]}x{shape[0]} at {fps:.0f} fps")
+        print(f"{'decoder':<34} {'frames/sec':>11} {'frames':>7}")
+        for name, run in modes:
+            rate, frames = run()
+            print(f"{name:<34} {rate:>11.1f} {frames:>7}")
+
+    small = (shape[0] // args.scale, shape[1] // args.scale, 3)
+    print(f"\nHandoff to a worker (us/frame){'':<6} {'pickle':>8} {'shared ring':>12}")
+    for label, frame_shape in (("full frame", shape), (f"1/{args.scale} frame", small)):
+        pickled, shared = handoff(frame_shape)
+        print(f"  {label:<34} {pickled:>8.0f} {shared:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
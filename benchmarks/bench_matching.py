@@ -0,0 +1,70 @@
+"""Per-frame matching cost: old compare_faces first-match loop vs FaceMatcher
+
+Run from the project root:  python benchmarks/bench_matching.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matcher import FaceMatcher
+
+
+def synthetic_gallery(size, seed=0):
+    """Random unit-ish 128-d encodings, roughly the spread of real dlib encodings"""
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0, 0.09, (size, 128)).astype(np.float32)
+    names = [f"person_{i}" for i in range(size)]
+    return encodings, names
+
+
+def old_match(known_faces, known_names, face_encodings, tolerance=0.6):
+    """The original recognize_faces loop (compare_faces, first True wins)"""
+    names = []
+    for face_encoding in face_encodings:
+        matches = list(np.linalg.norm(np.array(known_faces) - face_encoding, axis=1) <= tolerance)
+        name = "Unknown"
+        if True in matches:
+            name = known_names[matches.index(True)]
+        names.append(name)
+    return names
+
+
+def time_per_call(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--faces", type=int, default=5, help="faces per frame")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'gallery':>10} {'old (ms/frame)':>16} {'matcher (ms/frame)':>20} {'speedup':>9}")
+    for size in args.sizes:
+        encodings, names = synthetic_gallery(size)
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, size, args.faces)
+        frame_faces = encodings[picks] + rng.normal(0, 0.01, (args.faces, 128)).astype(np.float32)
+
+        known_faces = list(encodings.astype(np.float64))
+        old = time_per_call(lambda: old_match(known_faces, names, frame_faces), max(1, args.repeat // 4))
+
+        matcher = FaceMatcher()
+        matcher.set(encodings, names)
+        new = time_per_call(lambda: matcher.match(frame_faces), args.repeat)
+
+        print(f"{size:>10} {old * 1000:>16.2f} {new * 1000:>20.2f} {old / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
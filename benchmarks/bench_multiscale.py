@@ -0,0 +1,118 @@
+"""Detection cost and recall: full resolution vs fixed downscale vs multi-scale with ROIs
+
+Full-resolution detection is the reference: recall is the share of its
+faces that a mode also finds (IoU >= 0.3). With no faces in the reference
+there is nothing to measure recall against, and the benchmark fails.
+
+Run from the project root:
+    python benchmarks/bench_multiscale.py                    # lecture-hall mock-up from fixtures/face.jpg
+    python benchmarks/bench_multiscale.py --video hall.mp4 --roi 0,0,1,0.4
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+import face_recognition
+
+from regions import MultiScaleDetector, parse_roi
+from tracking import iou
+
+
+def hall_frames(image, count):
+    """1080p frames with the image pasted large at the front and small in the back rows"""
+    frames = []
+    for i in range(count):
+        canvas = np.full((1080, 1920, 3), 90, np.uint8)
+        for row, (height, y) in enumerate(((480, 560), (200, 240), (110, 60))):
+            tile = cv2.resize(image, (height * image.shape[1] // image.shape[0], height))
+            step = tile.shape[1] + 40
+            for x in range(20 + (i * 7 + row * 50) % 40, 1920 - tile.shape[1], step):
+                canvas[y:y + height, x:x + tile.shape[1]] = tile
+        frames.append(canvas)
+    return frames
+
+
+def video_frames(path, count):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def recall(found, reference):
+    hits = sum(1 for ref in reference if any(iou(ref, box) >= 0.3 for box in found))
+    return hits, len(reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", help="take frames from this video")
+    parser.add_argument("--image", default=os.path.join(BENCH_DIR, "fixtures", "face.jpg"),
+                        help="image with a face, pasted large at the front and small at the back")
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--scale", type=int, default=4)
+    parser.add_argument("--roi", type=parse_roi, action="append",
+                        help="x,y,w,h fractions (default: the back rows of the mock-up)")
+    args = parser.parse_args()
+
+    if args.video:
+        frames = video_frames(args.video, args.frames)
+    else:
+        image = cv2.imread(args.image)
+        if image is None:
+            raise SystemExit(f"Cannot read image: {args.image}")
+        frames = hall_frames(image, args.frames)
+    if not frames:
+        raise SystemExit("No frames to benchmark")
+    rois = args.roi or ([(0, 0, 1, 0.45)] if not args.video else [])
+    frames = [f[:, :, ::-1].copy() for f in frames]
+
+    def full_res(frame):
+        return face_recognition.face_locations(frame)
+
+    def downscaled(frame):
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (width // args.scale, height // args.scale))
+        return [tuple(v * args.scale for v in box) for box in face_recognition.face_locations(small)]
+
+    detector = MultiScaleDetector(args.scale, rois)
+    modes = [
+        ("full resolution", full_res),
+        (f"1/{args.scale} downscale", downscaled),
+        (f"multi-scale ({len(rois)} ROIs)", lambda frame: detector.detect(frame)[0]),
+    ]
+
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'mode':<26} {'ms/frame':>9} {'faces':>6} {'recall':>7}")
+    reference = None
+    for name, detect in modes:
+        found, seconds = [], 0.0
+        for frame in frames:
+            start = time.perf_counter()
+            found.append(detect(frame))
+            seconds += time.perf_counter() - start
+        if reference is None:
+            reference = found
+            if not any(reference):
+                print(f"{name:<26} {seconds / len(frames) * 1000:>9.1f} {0:>6} {'n/a':>7}")
+                sys.exit("✗ No faces at full resolution: there is no ground truth to measure recall against")
+        hits = [recall(f, r) for f, r in zip(found, reference)]
+        share = sum(h for h, _ in hits) / sum(n for _, n in hits)
+        print(f"{name:<26} {seconds / len(frames) * 1000:>9.1f} {sum(len(f) for f in found):>6} {share:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
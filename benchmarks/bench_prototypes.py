@@ -0,0 +1,68 @@
+"""Accuracy and latency vs photos per person: all encodings vs prototypes
+
+Run from the project root:  python benchmarks/bench_prototypes.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matcher import FaceMatcher
+
+
+def synthetic_people(people, photos, noise, seed=0):
+    """Per-person centres with noisy 'photos' around them"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.09, (people, 128)).astype(np.float32)
+    jitter = noise / np.sqrt(128)
+    encodings = np.repeat(centres, photos, axis=0) + rng.normal(0, jitter, (people * photos, 128)).astype(np.float32)
+    names = [f"person_{i}" for i in range(people) for _ in range(photos)]
+    return centres, encodings, names
+
+
+def evaluate(matcher, centres, noise, faces_per_frame, seed=1):
+    """Top-1 accuracy and ms per frame on fresh noisy views of each person"""
+    rng = np.random.default_rng(seed)
+    queries = centres + rng.normal(0, noise / np.sqrt(128), centres.shape).astype(np.float32)
+    matcher.match(queries[:1])
+
+    correct = 0
+    start = time.perf_counter()
+    for i in range(0, len(queries), faces_per_frame):
+        for j, match in enumerate(matcher.match(queries[i:i + faces_per_frame])):
+            correct += match.name == f"person_{i + j}"
+    frames = -(-len(queries) // faces_per_frame)
+    return correct / len(queries), (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--people", type=int, default=5000)
+    parser.add_argument("--photos", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--prototypes", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.45,
+                        help="distance between a photo and the person's true encoding")
+    parser.add_argument("--faces", type=int, default=5, help="faces per frame")
+    args = parser.parse_args()
+
+    print(f"{args.people} people, {args.faces} faces/frame, max {args.prototypes} prototypes per person")
+    print(f"{'photos':>7} {'rows (all)':>11} {'acc (all)':>10} {'ms/frame':>9} "
+          f"{'rows (proto)':>13} {'acc (proto)':>12} {'ms/frame':>9}")
+    for photos in args.photos:
+        centres, encodings, names = synthetic_people(args.people, photos, args.noise)
+        results = []
+        for max_prototypes in (None, args.prototypes):
+            matcher = FaceMatcher(max_prototypes=max_prototypes)
+            matcher.set(encodings, names)
+            results.append((len(matcher),) + evaluate(matcher, centres, args.noise, args.faces))
+        (rows_all, acc_all, ms_all), (rows_proto, acc_proto, ms_proto) = results
+        print(f"{photos:>7} {rows_all:>11} {acc_all:>10.3f} {ms_all:>9.2f} "
+              f"{rows_proto:>13} {acc_proto:>12.3f} {ms_proto:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Report query latency on a synthetic multi-year history, against loading and scanning all of it
+
+Run from the project root:
+    python benchmarks/bench_reports.py                          # 1000 people, 3 years of school days
+    python benchmarks/bench_reports.py --people 20000 --days 750
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from attendance_store import AttendanceStore
+from reports import AttendanceReports
+
+
+def fill(store, people, days, rate=0.9, seed=0):
+    """Mark each person on about `rate` of `days` weekdays; returns the dates used"""
+    rng = random.Random(seed)
+    dates, day = [], date(2022, 1, 3)
+    while len(dates) < days:
+        if day.weekday() < 5:
+            dates.append(day.isoformat())
+        day += timedelta(days=1)
+    with store.db:
+        for d in dates:
+            store.db.executemany("INSERT INTO marks (date, name, time) VALUES (?, ?, '09:00')",
+                                 ((d, name) for name in people if rng.random() < rate))
+    return dates
+
+
+def timed(function, repeat=5):
+    """Best of repeat runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def scan_rates(store, start, end):
+    """The old way: load {date: {name: time}} and count"""
+    counts = {}
+    for day, marks in store.all().items():
+        if start <= day <= end:
+            for name in marks:
+                counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.splitlines()[2:]))
+    parser.add_argument("--people", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=750, help="attendance days of history")
+    args = parser.parse_args()
+
+    people = [f"person{i:05d}" for i in range(args.people)]
+    with tempfile.TemporaryDirectory() as workspace:
+        store = AttendanceStore(os.path.join(workspace, "attendance.db"))
+        start = time.perf_counter()
+        dates = fill(store, people, args.days)
+        marks = store.db.execute("SELECT COUNT(*) FROM marks").fetchone()[0]
+        print(f"{marks} marks for {args.people} people over {len(dates)} days "
+              f"(written in {time.perf_counter() - start:.1f}s)")
+
+        reports = AttendanceReports(store, people)
+        week, year, last = (dates[-5], dates[-1]), (dates[-250], dates[-1]), people[-1]
+        queries = [
+            ("person history (all time)", lambda: reports.person(last)),
+            ("rates, last week", lambda: reports.rates(*week)),
+            ("rates, last year", lambda: reports.rates(*year)),
+            ("rates, all time", lambda: reports.rates()),
+            ("absent all last week", lambda: reports.absent(*week)),
+            ("CSV rows, last week", lambda: reports.marks(*week)),
+            ("full load + scan, last year", lambda: scan_rates(store, *year)),
+        ]
+        print(f"{'query':<30} {'ms':>9}")
+        for name, query in queries:
+            print(f"{name:<30} {timed(query, repeat=1 if 'scan' in name else 5):>9.1f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
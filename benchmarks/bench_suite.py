@@ -0,0 +1,328 @@
+"""End-to-end benchmark: startup, gallery loading, per-frame recognition and headless video
+
+Everything runs offline on the CPU inside a throwaway workspace, so the
+real faces/ folder and attendance.db are never touched. Photos and the
+reference clip are derived from fixtures/face.jpg (a public-domain NASA
+portrait) unless --image/--video are given, and the synthetic part of the
+gallery is seeded, so two runs on the same machine measure the same work.
+The run fails if a photo, the frames or the clip contain no detectable
+face, since the encode and match stages would then never be timed.
+
+Run from the project root:
+    python benchmarks/bench_suite.py --out before.json
+    python benchmarks/bench_suite.py --gallery 10000 --video lecture.mp4 --out after.json
+    python benchmarks/bench_suite.py --compare before.json after.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [ROOT, BENCH_DIR]
+
+FIXTURE = os.path.join(BENCH_DIR, "fixtures", "face.jpg")
+
+from bench_matching import synthetic_gallery
+from face_store import file_digest
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size so far (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentiles_ms(seconds):
+    p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1000
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+def variants(image, count, seed=0):
+    """Distinct copies of one image: small shifts plus faint noise"""
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        shifted = np.roll(image, (i % 7, i % 11), axis=(0, 1)).astype(np.int16)
+        noise = rng.integers(-2, 3, image.shape, dtype=np.int16)
+        yield np.clip(shifted + noise, 0, 255).astype(np.uint8)
+
+
+def scene(image, height):
+    """The image enlarged to a video-sized frame, so its face survives the pipeline's downscale"""
+    return cv2.resize(image, (image.shape[1] * height // image.shape[0], height))
+
+
+def write_clip(image, path, seconds=10, fps=25):
+    """Reference clip: the image panning slowly back and forth"""
+    height, width = (image.shape[0] // 2) * 2, (image.shape[1] // 2) * 2
+    image = cv2.resize(image, (width, height))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    for i in range(int(seconds * fps)):
+        dx = int(20 * np.sin(2 * np.pi * i / (fps * 4)))
+        writer.write(np.roll(image, dx, axis=1))
+    writer.release()
+    return path
+
+
+def bench_import(repeat=3):
+    """Cold interpreter start plus `import attendance`, best of repeat"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import attendance"], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# Fast-start path of the GUI: everything before the window can show
+COLD_START = """
+import sys
+import attendance
+attendance.SimpleAttendance(load=False).records.close()
+print(",".join(m for m in ("cv2", "face_recognition", "dlib", "tkinter") if m in sys.modules))
+"""
+
+
+def bench_cold_start(repeat=3):
+    """Fresh interpreter to a usable SimpleAttendance without the gallery, best of repeat.
+
+    Runs in the current (workspace) directory. Also returns the heavy
+    modules that were imported on the way, which should be none.
+    """
+    path = os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        done = subprocess.run([sys.executable, "-c", COLD_START], env=dict(os.environ, PYTHONPATH=path),
+                              check=True, stdout=subprocess.PIPE, text=True)
+        times.append(time.perf_counter() - start)
+    heavy = done.stdout.strip().splitlines()[-1] if done.stdout.strip() else ""
+    return min(times), [m for m in heavy.split(",") if m]
+
+
+def bench_gallery(image, photos, gallery, seed):
+    """Cold load (encode every photo), then startup and warm reload with a big cached gallery"""
+    from attendance import SimpleAttendance
+
+    os.makedirs("faces", exist_ok=True)
+    for i, photo in enumerate(variants(image, photos, seed)):
+        cv2.imwrite(os.path.join("faces", f"photo_{i}.png"), photo)
+
+    start = time.perf_counter()
+    attendance = SimpleAttendance()
+    cold = time.perf_counter() - start
+    results = {"load_faces.cold_s": cold, "load_faces.cold_photos_per_s": photos / cold}
+
+    # Synthetic people go straight into the encoding cache; their files are
+    # placeholders that are reused by size and mtime, never decoded
+    encodings, names = synthetic_gallery(gallery, seed)
+    items = []
+    for encoding, name in zip(encodings, names):
+        filename = f"{name}.jpg"
+        path = os.path.join("faces", filename)
+        with open(path, "wb") as f:
+            f.write(name.encode())
+        items.append((filename, encoding, file_digest(path)))
+    attendance.store.add_batch(items)
+
+    start = time.perf_counter()
+    attendance = SimpleAttendance()
+    results["startup.attendance_s"] = time.perf_counter() - start
+
+    reloads = []
+    for _ in range(3):
+        start = time.perf_counter()
+        attendance.load_faces()
+        reloads.append(time.perf_counter() - start)
+    results["load_faces.warm_s"] = float(np.median(reloads))
+    return attendance, results
+
+
+def bench_recognize(attendance, image, frames, scale, seed):
+    """recognize_faces on downscaled frames, as the pipeline feeds it"""
+    height, width = image.shape[:2]
+    inputs = [cv2.resize(f, (width // scale, height // scale))[:, :, ::-1].copy()
+              for f in variants(image, frames, seed)]
+    attendance.recognize_faces(inputs[0])  # load models before timing
+
+    times, faces = [], 0
+    for frame in inputs:
+        start = time.perf_counter()
+        locations, _ = attendance.recognize_faces(frame)
+        times.append(time.perf_counter() - start)
+        faces += len(locations)
+    results = {f"recognize.{k}": v for k, v in percentiles_ms(times).items()}
+    results["recognize.fps"] = len(times) / sum(times)
+    results["recognize.faces"] = faces
+    return results
+
+
+def bench_video(attendance, clip, workers, sample_fps):
+    """Headless VideoPipeline run (what process_video does, minus the window)"""
+    from metrics import Metrics
+    from pipeline import VideoPipeline
+
+    metrics = Metrics()
+    pipeline = VideoPipeline(attendance, workers=workers, sample_fps=sample_fps,
+                             render=False, metrics=metrics)
+    summary = pipeline.run(clip)
+
+    name = os.path.splitext(os.path.basename(clip))[0]
+    results = {
+        f"video.{name}.fps": summary["fps"],
+        f"video.{name}.elapsed_s": summary["elapsed"],
+        f"video.{name}.faces": summary["faces_seen"],
+    }
+    for stage, h in metrics.to_dict()["stages"].items():
+        results[f"video.{name}.{stage}_p50_ms"] = h["p50"] * 1000
+        results[f"video.{name}.{stage}_p95_ms"] = h["p95"] * 1000
+    return results
+
+
+def higher_is_better(key):
+    return key.endswith(("fps", "per_s"))
+
+
+def compare(before_path, after_path, threshold):
+    """Print the change of every shared metric; returns the regressed keys"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    for key in ("cpu_count", "machine", "gallery", "photos", "workers"):
+        if before["meta"].get(key) != after["meta"].get(key):
+            print(f"! {key} differs: {before['meta'].get(key)} vs {after['meta'].get(key)}")
+
+    regressions = []
+    print(f"{'metric':<40} {'before':>11} {'after':>11} {'change':>8}")
+    for key in sorted(set(before["results"]) & set(after["results"])):
+        old, new = before["results"][key], after["results"][key]
+        if not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better(key) else change
+        flag = ""
+        if key.endswith("faces"):
+            pass  # a count, not a cost
+        elif worse > threshold:
+            flag = "  ✗ regression"
+            regressions.append(key)
+        elif worse < -threshold:
+            flag = "  ✓ improved"
+        print(f"{key:<40} {old:>11.3f} {new:>11.3f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.splitlines()[2:]))
+    parser.add_argument("--gallery", type=int, default=1000, help="synthetic people in the cached gallery")
+    parser.add_argument("--photos", type=int, default=8, help="real photos encoded on the cold load")
+    parser.add_argument("--image", default=FIXTURE, help="fixture image with one face")
+    parser.add_argument("--frame-height", type=int, default=720,
+                        help="height the image is enlarged to for the recognize and video benchmarks")
+    parser.add_argument("--video", nargs="*", default=[], help="reference clips (default: generated from --image)")
+    parser.add_argument("--frames", type=int, default=30, help="frames for the recognize_faces benchmark")
+    parser.add_argument("--scale", type=int, default=4, help="downscale factor, as in process_video")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--sample-fps", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--startup-budget", type=float, default=1.0,
+                        help="cold-start budget in seconds (interpreter start to a usable app, gallery not loaded)")
+    parser.add_argument("--out", default="bench_results.json", help="results file (JSON)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two results files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+    image = cv2.imread(args.image)
+    if image is None:
+        parser.error(f"cannot read image: {args.image}")
+    clips = [os.path.abspath(v) for v in args.video]
+    out = os.path.abspath(args.out)
+
+    results = {"startup.import_s": bench_import()}
+    with tempfile.TemporaryDirectory(prefix="attendance-bench-") as workspace:
+        os.chdir(workspace)
+        if not clips:
+            clips = [write_clip(scene(image, args.frame_height), os.path.join(workspace, "reference.avi"))]
+
+        print("Cold start (fast-start path)...")
+        results["startup.cold_start_s"], heavy = bench_cold_start()
+
+        print(f"Gallery: {args.photos} photos + {args.gallery} cached people...")
+        attendance, gallery_results = bench_gallery(image, args.photos, args.gallery, args.seed)
+        results.update(gallery_results)
+        faceless = sorted(f for f, e in attendance.store.entries.items() if e["row"] is None)
+        if faceless:
+            sys.exit(f"✗ No face found in {len(faceless)} of {args.photos} photos made from {args.image} "
+                     f"({', '.join(faceless[:3])}{', ...' if len(faceless) > 3 else ''}): "
+                     f"gallery timings would not include encoding")
+
+        print(f"recognize_faces: {args.frames} frames...")
+        results.update(bench_recognize(attendance, scene(image, args.frame_height), args.frames,
+                                       args.scale, args.seed))
+        if not results["recognize.faces"]:
+            sys.exit(f"✗ recognize_faces found no faces in {args.frames} frames: "
+                     f"encode and match were never timed (try a larger --frame-height)")
+
+        for clip in clips:
+            print(f"Video: {os.path.basename(clip)} ({args.workers} workers)...")
+            results.update(bench_video(attendance, clip, args.workers, args.sample_fps))
+            name = os.path.splitext(os.path.basename(clip))[0]
+            if not results[f"video.{name}.faces"]:
+                sys.exit(f"✗ No faces found in {os.path.basename(clip)}: the video run timed detection only")
+        attendance.records.close()
+        os.chdir(ROOT)
+
+    results["memory.peak_rss_mb"] = peak_rss_mb()
+    results["memory.peak_worker_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "gallery": args.gallery,
+            "photos": args.photos,
+            "workers": args.workers,
+            "clips": [os.path.basename(c) for c in clips],
+            "seed": args.seed,
+            "startup_budget_s": args.startup_budget,
+            "cold_start_heavy_imports": heavy,
+        },
+        "results": results,
+    }
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for key, value in results.items():
+        print(f"  {key:<40} {value:>11.3f}")
+    cold = results["startup.cold_start_s"]
+    print(f"{'✓' if cold <= args.startup_budget else '✗'} Cold start {cold:.2f}s "
+          f"(budget {args.startup_budget:.2f}s)"
+          f"{', loaded ' + ', '.join(heavy) if heavy else ', no OpenCV/dlib/Tk imported'}")
+    print(f"✓ Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
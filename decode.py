@@ -0,0 +1,155 @@
+import shutil
+import subprocess
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+SHM_DIR = "/dev/shm"
+
+
+def shared_memory_budget(fraction=0.5):
+    """Bytes a frame ring may take: a fraction of the free space in /dev/shm, or None where there is none"""
+    try:
+        return int(shutil.disk_usage(SHM_DIR).free * fraction)
+    except OSError:
+        return None
+
+
+def open_capture(path, threads=0, hw_accel=True):
+    """Open a video file with the FFmpeg backend, multithreaded and hardware-decoded where possible.
+
+    threads=0 lets FFmpeg use one decoding thread per core. Hardware
+    decoding falls back to software when no accelerator is available, and
+    the default backend is used if OpenCV was built without FFmpeg.
+    """
+    params = [cv2.CAP_PROP_N_THREADS, threads]
+    if hw_accel:
+        params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG, params)
+    if not cap.isOpened():
+        cap = cv2.VideoCapture(path)
+    return cap
+
+
+class FFmpegCapture:
+    """Decode a video with an ffmpeg subprocess straight to 1/scale resolution.
+
+    Scaling happens inside ffmpeg's decode threads, so full-size BGR frames
+    are never materialized in Python. Implements the subset of the
+    cv2.VideoCapture interface the pipeline uses (read, grab, get,
+    isOpened, release); frames come out at width // scale x height // scale.
+    Requires the ffmpeg binary on PATH (see available()).
+    """
+
+    def __init__(self, path, scale=1, threads=0, hw_accel=True):
+        probe = cv2.VideoCapture(path)
+        self._props = {prop: probe.get(prop) for prop in
+                       (cv2.CAP_PROP_FPS, cv2.CAP_PROP_FRAME_COUNT,
+                        cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT)}
+        opened = probe.isOpened()
+        probe.release()
+
+        self.scale = scale
+        self.width = int(self._props[cv2.CAP_PROP_FRAME_WIDTH]) // scale
+        self.height = int(self._props[cv2.CAP_PROP_FRAME_HEIGHT]) // scale
+        self._props[cv2.CAP_PROP_FRAME_WIDTH] = self.width
+        self._props[cv2.CAP_PROP_FRAME_HEIGHT] = self.height
+        self.frame_size = self.width * self.height * 3
+        self._scratch = bytearray(self.frame_size)
+        self.process = None
+        if not opened or self.width == 0 or self.height == 0:
+            return
+
+        command = ["ffmpeg", "-loglevel", "error", "-nostdin", "-threads", str(threads)]
+        if hw_accel:
+            command += ["-hwaccel", "auto"]
+        command += ["-i", path, "-vf", f"scale={self.width}:{self.height}",
+                    "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=self.frame_size)
+
+    @staticmethod
+    def available():
+        return shutil.which("ffmpeg") is not None
+
+    def isOpened(self):
+        return self.process is not None
+
+    def get(self, prop):
+        return self._props.get(prop, 0.0)
+
+    def _read_into(self, buffer):
+        view, filled = memoryview(buffer).cast("B"), 0
+        while filled < self.frame_size:
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                return False
+            filled += count
+        return True
+
+    def grab(self):
+        return self.process is not None and self._read_into(self._scratch)
+
+    def read(self, image=None):
+        """Like cv2.VideoCapture.read; pass image to decode into an existing array"""
+        if self.process is None:
+            return False, None
+        if image is None or image.shape != (self.height, self.width, 3) or not image.flags.c_contiguous:
+            image = np.empty((self.height, self.width, 3), np.uint8)
+        if not self._read_into(image):
+            return False, None
+        return True, image
+
+    def release(self):
+        if self.process is not None:
+            self.process.stdout.close()
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+
+class FrameRing:
+    """Fixed-size frames in shared memory, handed to worker processes by slot number.
+
+    The decoder writes a frame into the next slot and sends only the slot
+    number, instead of pickling the array through the pool's pipe. Slots
+    are reused round-robin, so the caller must keep at most `slots` frames
+    in the ring at once (VideoPipeline counts them with a semaphore and
+    pickles the frames that find no free slot). /dev/shm is small in
+    containers (64 MB by default in Docker) and overflowing it kills the
+    process with SIGBUS, so size rings with shared_memory_budget().
+    Workers attach with FrameRing.attach(*ring.spec).
+    """
+
+    def __init__(self, slots, shape, name=None):
+        self.slots = slots
+        self.shape = tuple(shape)
+        size = slots * int(np.prod(self.shape))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            try:
+                # Python 3.13+: don't let a worker's resource tracker unlink the parent's memory
+                self.shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.frames = np.ndarray((slots,) + self.shape, np.uint8, self.shm.buf)
+
+    @classmethod
+    def attach(cls, name, slots, shape):
+        return cls(slots, shape, name)
+
+    @property
+    def spec(self):
+        return self.shm.name, self.slots, self.shape
+
+    def slot(self, index):
+        return self.frames[index % self.slots]
+
+    def close(self):
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
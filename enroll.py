@@ -0,0 +1,120 @@
+"""Bulk enrollment from a photo directory tree or a CSV of name,image_path
+
+Examples:
+    python enroll.py students/            # students/<name>/*.jpg or students/<name>.jpg
+    python enroll.py roster.csv --jobs 8  # rows of name,image_path
+"""
+import argparse
+import csv
+import os
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from face_store import IMAGE_EXTENSIONS, EncodingStore, file_digest
+
+
+def find_photos(source):
+    """Return [(name, image_path)] from a directory tree or a CSV file"""
+    photos = []
+    if os.path.isdir(source):
+        for entry in sorted(os.listdir(source)):
+            path = os.path.join(source, entry)
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    photos.extend((entry, os.path.join(root, f)) for f in sorted(files)
+                                  if f.lower().endswith(IMAGE_EXTENSIONS))
+            elif entry.lower().endswith(IMAGE_EXTENSIONS):
+                photos.append((os.path.splitext(entry)[0], path))
+        return photos
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0].strip() or row[0].strip().lower() == "name":
+                continue
+            name, path = row[0].strip(), row[1].strip()
+            photos.append((name, path if os.path.isabs(path) else os.path.join(base, path)))
+    return photos
+
+
+def encode_photo(item):
+    """Worker: encode the single face in a photo, or explain why it was rejected"""
+    import face_recognition
+
+    name, path = item
+    try:
+        image = face_recognition.load_image_file(path)
+    except Exception as e:
+        return name, path, None, None, f"unreadable image ({e})"
+
+    locations = face_recognition.face_locations(image)
+    if not locations:
+        return name, path, None, None, "no face found"
+    if len(locations) > 1:
+        return name, path, None, None, f"{len(locations)} faces found"
+
+    encoding = face_recognition.face_encodings(image, locations)[0]
+    return name, path, encoding, file_digest(path), None
+
+
+def enroll(photos, faces_dir="faces", jobs=None):
+    """Encode photos in parallel and add the accepted ones to the gallery in one transaction.
+
+    Returns (accepted, rejected) where rejected is a list of (name, path, reason).
+    """
+    accepted, rejected = [], []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for name, path, encoding, digest, reason in pool.map(encode_photo, photos, chunksize=8):
+            if reason:
+                rejected.append((name, path, reason))
+                print(f"✗ {name}: {path} - {reason}")
+            else:
+                accepted.append((name, path, encoding, digest))
+
+    store = EncodingStore(faces_dir)
+    items = []
+    for name, path, encoding, digest in accepted:
+        filename = store.photo_filename(name, os.path.splitext(path)[1].lower())
+        shutil.copy(path, os.path.join(faces_dir, filename))
+        items.append((filename, encoding, digest))
+    store.add_batch(items)
+    return accepted, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.splitlines()[2:]))
+    parser.add_argument("source", help="photo directory or CSV file")
+    parser.add_argument("--jobs", type=int, default=None, help="encoding processes (default: CPU count)")
+    parser.add_argument("--faces", default="faces", help="gallery folder")
+    parser.add_argument("--rejects", help="write rejected photos and reasons to this CSV")
+    args = parser.parse_args()
+
+    photos = find_photos(args.source)
+    if not photos:
+        parser.error("no photos found")
+
+    print(f"Enrolling {len(photos)} photos of {len({name for name, _ in photos})} people...")
+    start = time.perf_counter()
+    accepted, rejected = enroll(photos, args.faces, args.jobs)
+    elapsed = time.perf_counter() - start
+
+    if args.rejects:
+        with open(args.rejects, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "path", "reason"])
+            writer.writerows(rejected)
+
+    reasons = Counter("unreadable image" if r.startswith("unreadable") else
+                      "multiple faces" if r.endswith("faces found") else r
+                      for _, _, r in rejected)
+    print(f"\n✓ Enrolled {len(accepted)} photos of {len({a[0] for a in accepted})} people "
+          f"in {elapsed:.1f}s ({len(photos) / elapsed:.1f} photos/sec)")
+    print(f"✗ Rejected {len(rejected)}" + "".join(f"\n  {reason}: {count}" for reason, count in reasons.items()))
+
+
+if __name__ == "__main__":
+    main()
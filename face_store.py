@@ -0,0 +1,347 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+ENCODING_SIZE = 128
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+
+
+def file_digest(path):
+    """SHA-1 of a file's content"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EncodingStore:
+    """On-disk cache of face encodings for the images in the 'faces' folder.
+
+    Photos are either faces/{name}.jpg or any number of images in a
+    per-person folder faces/{name}/. Encodings live in a raw float32 matrix
+    (one row per image) that is only ever appended to, next to a JSON-lines
+    manifest keyed by filename, size, mtime and content hash. A later
+    manifest line for the same file replaces the earlier one, so adding or
+    changing an image costs one encode and two appends. Stale rows are
+    dropped by compact().
+    """
+
+    def __init__(self, faces_dir="faces", cache_dir=None):
+        self.faces_dir = faces_dir
+        self.cache_dir = cache_dir or os.path.join(faces_dir, ".cache")
+        self.matrix_path = os.path.join(self.cache_dir, "encodings-0.f32")
+        self.manifest_path = os.path.join(self.cache_dir, "manifest.jsonl")
+        self.clusters_path = os.path.join(self.cache_dir, "prototypes.npz")
+        self.entries = {}
+        self.rows = 0
+        self.stale_rows = 0
+        self.stats = {"reused": 0, "encoded": 0, "removed": 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._read_manifest()
+
+    def _read_manifest(self):
+        """Load the manifest, ignoring rows a crash left half-written"""
+        matrix_rows = 0
+        manifest_lines = 0
+        batches = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    manifest_lines += 1
+                    if "matrix" in entry:
+                        self.matrix_path = os.path.join(self.cache_dir, entry["matrix"])
+                        if os.path.exists(self.matrix_path):
+                            matrix_rows = os.path.getsize(self.matrix_path) // (ENCODING_SIZE * 4)
+                        continue
+                    # Batch entries only take effect once their commit line is written
+                    if "commit" in entry:
+                        for batch_entry in batches.pop(entry["commit"], []):
+                            self._apply(batch_entry, matrix_rows)
+                        continue
+                    if "batch" in entry:
+                        batches.setdefault(entry["batch"], []).append(entry)
+                        continue
+                    self._apply(entry, matrix_rows)
+
+        self.rows = matrix_rows
+        live = sum(1 for e in self.entries.values() if e["row"] is not None)
+        self.stale_rows = self.rows - live
+        self._manifest_lines = manifest_lines
+
+    def _apply(self, entry, matrix_rows):
+        entry.pop("batch", None)
+        if entry.get("deleted"):
+            self.entries.pop(entry["file"], None)
+        elif entry["row"] is None or entry["row"] < matrix_rows:
+            self.entries[entry["file"]] = entry
+
+    def _append_manifest(self, *entries, sync=False):
+        lines = list(entries)
+        if not os.path.exists(self.manifest_path):
+            lines.insert(0, {"matrix": os.path.basename(self.matrix_path)})
+        with open(self.manifest_path, "a") as f:
+            f.write("".join(json.dumps(line) + "\n" for line in lines))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        self._manifest_lines += len(lines)
+
+    def _append_rows(self, encodings, sync=False):
+        rows = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        # Truncate any half-written tail left by a crash before appending
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(self.rows * ENCODING_SIZE * 4)
+            f.write(rows.tobytes())
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        first = self.rows
+        self.rows += len(rows)
+        return list(range(first, self.rows))
+
+    def _append_row(self, encoding):
+        return self._append_rows([encoding])[0]
+
+    def scan(self):
+        """List image files in the faces folder and in per-person subfolders, relative to it"""
+        files = []
+        for filename in os.listdir(self.faces_dir):
+            path = os.path.join(self.faces_dir, filename)
+            if filename.startswith('.'):
+                continue
+            if os.path.isdir(path):
+                files.extend(f"{filename}/{photo}" for photo in os.listdir(path)
+                             if photo.lower().endswith(IMAGE_EXTENSIONS))
+            elif filename.lower().endswith(IMAGE_EXTENSIONS):
+                files.append(filename)
+        return sorted(files)
+
+    def name_for(self, filename):
+        """Person name for a gallery file: its folder, or the file name for faces/{name}.jpg"""
+        if "/" in filename:
+            return filename.split("/")[0]
+        return filename.split('.')[0]
+
+    def names(self):
+        """Registered people, from the gallery file names alone (nothing is encoded)"""
+        return sorted({self.name_for(filename) for filename in self.scan()})
+
+    def add(self, filename, encode, digest=None):
+        """Encode one gallery file and append it to the store.
+
+        encode(path) must return a 128-d encoding, or None when the image
+        has no face. Returns the encoding (or None).
+        """
+        path = os.path.join(self.faces_dir, filename)
+        st = os.stat(path)
+        encoding = encode(path)
+
+        old = self.entries.get(filename)
+        if old is not None and old["row"] is not None:
+            self.stale_rows += 1
+
+        entry = {
+            "file": filename,
+            "name": self.name_for(filename),
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "sha1": digest or file_digest(path),
+            "row": None if encoding is None else self._append_row(encoding),
+        }
+        self._append_manifest(entry)
+        self.entries[filename] = entry
+        self.stats["encoded"] += 1
+        return encoding
+
+    def add_batch(self, items):
+        """Add many already-encoded gallery files as one transaction.
+
+        items are (filename, encoding, sha1) with files already in place.
+        The rows are appended and synced first, then the manifest entries
+        followed by a commit line; entries of a batch whose commit line is
+        missing after a crash are ignored on the next load.
+        """
+        if not items:
+            return
+        rows = self._append_rows([encoding for _, encoding, _ in items], sync=True)
+        batch = f"{self.rows}-{len(items)}"
+
+        entries = []
+        for (filename, _, digest), row in zip(items, rows):
+            st = os.stat(os.path.join(self.faces_dir, filename))
+            entries.append({
+                "file": filename,
+                "name": self.name_for(filename),
+                "size": st.st_size,
+                "mtime": st.st_mtime,
+                "sha1": digest,
+                "row": row,
+                "batch": batch,
+            })
+            if filename in self.entries and self.entries[filename]["row"] is not None:
+                self.stale_rows += 1
+        self._append_manifest(*entries, {"commit": batch}, sync=True)
+
+        for entry in entries:
+            del entry["batch"]
+            self.entries[entry["file"]] = entry
+        self.stats["encoded"] += len(entries)
+
+    def photo_filename(self, name, extension=".jpg"):
+        """Next free numbered photo filename in a person's folder, relative to the faces folder"""
+        person_dir = os.path.join(self.faces_dir, name)
+        os.makedirs(person_dir, exist_ok=True)
+        number = len(os.listdir(person_dir)) + 1
+        while os.path.exists(os.path.join(person_dir, f"{number}{extension}")):
+            number += 1
+        return f"{name}/{number}{extension}"
+
+    def remove(self, filename):
+        """Forget a gallery file"""
+        old = self.entries.pop(filename, None)
+        if old is None:
+            return
+        if old["row"] is not None:
+            self.stale_rows += 1
+        self._append_manifest({"file": filename, "deleted": True})
+        self.stats["removed"] += 1
+
+    def sync(self, encode, progress=None):
+        """Bring the store in line with the faces folder.
+
+        Files whose size and mtime are unchanged are reused as-is; files
+        that were touched but still hash the same are reused too. Only new
+        or modified images are passed to encode(). stats counts this sync only.
+        progress(done, total) is called before each file is checked and once at the end.
+        """
+        self.stats = dict.fromkeys(self.stats, 0)
+        files = self.scan()
+        present = set(files)
+
+        for filename in list(self.entries):
+            if filename not in present:
+                self.remove(filename)
+
+        for done, filename in enumerate(files):
+            if progress is not None:
+                progress(done, len(files))
+            path = os.path.join(self.faces_dir, filename)
+            st = os.stat(path)
+            entry = self.entries.get(filename)
+
+            if entry is not None and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+                self.stats["reused"] += 1
+                continue
+
+            digest = file_digest(path)
+            if entry is not None and entry["sha1"] == digest:
+                entry = dict(entry, size=st.st_size, mtime=st.st_mtime)
+                self._append_manifest(entry)
+                self.entries[filename] = entry
+                self.stats["reused"] += 1
+                continue
+
+            self.add(filename, encode, digest=digest)
+
+        if progress is not None:
+            progress(len(files), len(files))
+        if self.needs_compaction():
+            self.compact()
+
+    def needs_compaction(self):
+        live = len(self.entries)
+        return self.stale_rows > max(16, self.rows // 4) or self._manifest_lines > max(64, 2 * live)
+
+    def compact(self):
+        """Rewrite the matrix and manifest without stale rows"""
+        matrix = self._load_matrix()
+        live = sorted(self.entries.values(), key=lambda e: e["file"])
+
+        rows = [e["row"] for e in live if e["row"] is not None]
+        compacted = matrix[rows] if rows else np.zeros((0, ENCODING_SIZE), np.float32)
+
+        new_entries = {}
+        next_row = 0
+        for entry in live:
+            if entry["row"] is not None:
+                entry = dict(entry, row=next_row)
+                next_row += 1
+            new_entries[entry["file"]] = entry
+
+        # Write the compacted rows to the next matrix generation, then swap
+        # in a manifest that points at it. Until the manifest is replaced the
+        # old generation is still complete, so a crash leaves a usable store.
+        generation = int(os.path.basename(self.matrix_path).split('-')[1].split('.')[0]) + 1
+        new_matrix = os.path.join(self.cache_dir, f"encodings-{generation}.f32")
+        tmp_manifest = self.manifest_path + ".tmp"
+        with open(new_matrix, "wb") as f:
+            f.write(np.ascontiguousarray(compacted, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(tmp_manifest, "w") as f:
+            f.write(json.dumps({"matrix": os.path.basename(new_matrix)}) + "\n")
+            for entry in new_entries.values():
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_manifest, self.manifest_path)
+
+        del matrix
+        old_matrix, self.matrix_path = self.matrix_path, new_matrix
+        if os.path.exists(old_matrix):
+            os.remove(old_matrix)
+
+        self.entries = new_entries
+        self.rows = next_row
+        self.stale_rows = 0
+        self._manifest_lines = len(new_entries) + 1
+
+    def _load_matrix(self):
+        if self.rows == 0:
+            return np.zeros((0, ENCODING_SIZE), np.float32)
+        return np.memmap(self.matrix_path, dtype=np.float32, mode="r",
+                         shape=(self.rows, ENCODING_SIZE))
+
+    def load_clusters(self):
+        """Prototypes saved by save_clusters, as FaceMatcher.clusters; empty if missing or unreadable"""
+        if not os.path.exists(self.clusters_path):
+            return {}
+        try:
+            with np.load(self.clusters_path) as data:
+                names, keys, counts, rows = data["names"], data["keys"], data["counts"], data["rows"]
+        except (OSError, ValueError, KeyError):
+            return {}
+        clusters, start = {}, 0
+        for name, key, count in zip(names, keys, counts):
+            clusters[str(name)] = (str(key), rows[start:start + count])
+            start += count
+        return clusters
+
+    def save_clusters(self, clusters):
+        """Persist FaceMatcher.clusters next to the encodings, replacing the previous file"""
+        names = list(clusters)
+        rows = [clusters[name][1] for name in names]
+        tmp_path = self.clusters_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, names=np.array(names, dtype=str),
+                     keys=np.array([clusters[name][0] for name in names], dtype=str),
+                     counts=np.array([len(r) for r in rows], np.int64),
+                     rows=np.concatenate(rows) if rows else np.zeros((0, ENCODING_SIZE), np.float32))
+        os.replace(tmp_path, self.clusters_path)
+
+    def gallery(self):
+        """Return (encodings, names) for every file with a face, sorted by file"""
+        live = [e for e in sorted(self.entries.values(), key=lambda e: e["file"])
+                if e["row"] is not None]
+        matrix = self._load_matrix()
+        encodings = np.array(matrix[[e["row"] for e in live]]) if live else \
+            np.zeros((0, ENCODING_SIZE), np.float32)
+        return encodings, [e["name"] for e in live]
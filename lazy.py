@@ -0,0 +1,34 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a module that is imported the first time one of its attributes is used.
+
+    Lets heavy imports (OpenCV, dlib via face_recognition, Tk) stay at the
+    top of a module without being paid for until they are needed:
+        cv2 = LazyModule("cv2")
+    The import is guarded by a lock so it happens once even when the first
+    use comes from two threads at the same time.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._module or self._load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}{'' if self.loaded else ' (not loaded)'}>"
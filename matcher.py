@@ -0,0 +1,208 @@
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+from ann_index import kmeans
+from face_store import ENCODING_SIZE
+
+DEFAULT_TOLERANCE = 0.6
+DEFAULT_PROTOTYPES = 3
+
+Match = namedtuple("Match", ["name", "distance", "margin"])
+Match.__doc__ = """Best gallery match for one face.
+
+name is "Unknown" when the closest identity is further than the tolerance.
+margin is the distance gap to the runner-up identity (inf if there is none).
+"""
+
+
+def prototypes(encodings, count):
+    """Compress one person's encodings into at most count prototypes"""
+    encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+    if count is None or len(encodings) <= count:
+        return encodings
+    return kmeans(encodings, count)
+
+
+def prototype_key(encodings, count):
+    """Digest of one person's encodings and the prototype count their clusters were computed for"""
+    digest = hashlib.sha1(np.ascontiguousarray(encodings, dtype=np.float32).tobytes())
+    digest.update(str(count).encode())
+    return digest.hexdigest()
+
+
+class FaceMatcher:
+    """Nearest-neighbour matcher over a contiguous float32 gallery.
+
+    Every enrolled encoding is kept per person, but the matrix that is
+    searched holds at most max_prototypes rows per person: once someone has
+    more photos than that, their encodings are clustered and the cluster
+    centres replace their rows in place. More photos therefore make each
+    prototype a better average without making matching slower.
+    max_prototypes=None keeps one row per photo.
+
+    Clustering is the slow part of set(), so the prototypes of everyone who
+    was clustered are kept in clusters ({name: (prototype_key, rows)}) and
+    reused by the next set() for people whose encodings have not changed.
+    Pass clusters saved from an earlier run to set() to reuse them too.
+
+    The matrix is preallocated and grows by doubling, so adding a photo is
+    an amortized O(1) append. All faces in a frame are scored against the
+    whole gallery in a single matrix product using
+    |a - b|^2 = |a|^2 + |b|^2 - 2 a.b.
+
+    An optional index (see ann_index.IVFIndex) is kept in sync with the
+    gallery and used instead of the exact scan once it is trained.
+    """
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, index=None, max_prototypes=DEFAULT_PROTOTYPES):
+        self.tolerance = tolerance
+        self.index = index
+        self.max_prototypes = max_prototypes
+        self.names = []
+        self._photos = {}
+        self._rows = {}
+        self.clusters = {}
+        self._widest = 0
+        self._matrix = np.zeros((16, ENCODING_SIZE), np.float32)
+        self._norms = np.zeros(16, np.float32)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def encodings(self):
+        """View of the live gallery rows (prototypes)"""
+        return self._matrix[:len(self.names)]
+
+    @property
+    def identities(self):
+        """Enrolled people, in enrollment order"""
+        return list(self._rows)
+
+    def photo_count(self, name):
+        return len(self._photos.get(name, ()))
+
+    def set(self, encodings, names, clusters=None):
+        """Replace the whole gallery; names may repeat for people with several photos"""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        self._photos = {}
+        for encoding, name in zip(encodings, names):
+            self._photos.setdefault(name, []).append(encoding)
+
+        known = self.clusters if clusters is None else clusters
+        rows, row_names, self._rows, self.clusters = [], [], {}, {}
+        for name, photos in self._photos.items():
+            if self.max_prototypes is None or len(photos) <= self.max_prototypes:
+                compressed = np.asarray(photos, dtype=np.float32)
+            else:
+                key = prototype_key(photos, self.max_prototypes)
+                cached = known.get(name)
+                compressed = cached[1] if cached is not None and cached[0] == key else \
+                    prototypes(photos, self.max_prototypes)
+                self.clusters[name] = (key, compressed)
+            self._rows[name] = list(range(len(row_names), len(row_names) + len(compressed)))
+            rows.append(compressed)
+            row_names.extend([name] * len(compressed))
+        matrix = np.concatenate(rows) if rows else np.zeros((0, ENCODING_SIZE), np.float32)
+        self._widest = max((len(r) for r in self._rows.values()), default=0)
+
+        capacity = max(16, len(matrix))
+        self._matrix = np.zeros((capacity, ENCODING_SIZE), np.float32)
+        self._matrix[:len(matrix)] = matrix
+        self._norms = np.zeros(capacity, np.float32)
+        self._norms[:len(matrix)] = np.einsum('ij,ij->i', matrix, matrix)
+        self.names = row_names
+
+        if self.index is not None:
+            self.index.reset()
+            self.index.add(matrix, np.arange(len(matrix)))
+
+    def _append_row(self, row, name):
+        count = len(self.names)
+        if count == len(self._matrix):
+            self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+            self._norms = np.concatenate([self._norms, np.zeros_like(self._norms)])
+        self._matrix[count] = row
+        self._norms[count] = row @ row
+        self.names.append(name)
+        self._rows.setdefault(name, []).append(count)
+        self._widest = max(self._widest, len(self._rows[name]))
+        if self.index is not None:
+            self.index.add(row, [count])
+
+    def add(self, encoding, name):
+        """Add one photo's encoding to a (new or existing) person"""
+        row = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_SIZE)
+        photos = self._photos.setdefault(name, [])
+        photos.append(row)
+
+        if self.max_prototypes is None or len(photos) <= self.max_prototypes:
+            self._append_row(row, name)
+            return
+
+        # Re-cluster this person and overwrite their rows in place
+        rows = self._rows[name]
+        compressed = prototypes(photos, self.max_prototypes)
+        self.clusters[name] = (prototype_key(photos, self.max_prototypes), compressed)
+        self._matrix[rows] = compressed
+        self._norms[rows] = np.einsum('ij,ij->i', compressed, compressed)
+        if self.index is not None:
+            self.index.remove(rows)
+            self.index.add(compressed, rows)
+
+    def remove(self, name):
+        """Drop every encoding of a person"""
+        if name not in self._photos:
+            return
+        photos = {n: p for n, p in self._photos.items() if n != name}
+        self.set([e for p in photos.values() for e in p], [n for n, p in photos.items() for _ in p])
+
+    def distances(self, encodings):
+        """Euclidean distance of each query (rows) to each gallery entry (columns)"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        gallery = self.encodings
+        squared = (np.einsum('ij,ij->i', queries, queries)[:, None]
+                   + self._norms[:len(self.names)][None, :]
+                   - 2.0 * (queries @ gallery.T))
+        np.maximum(squared, 0, out=squared)
+        return np.sqrt(squared, out=squared)
+
+    def match(self, encodings):
+        """Return a Match for every query encoding; None (a face that was not encoded) is Unknown"""
+        if len(encodings) == 0:
+            return []
+        if any(e is None for e in encodings):
+            encoded = [i for i, e in enumerate(encodings) if e is not None]
+            matches = [Match("Unknown", float("inf"), float("inf")) for _ in encodings]
+            for i, match in zip(encoded, self.match([encodings[i] for i in encoded])):
+                matches[i] = match
+            return matches
+        if not self.names:
+            return [Match("Unknown", float("inf"), float("inf")) for _ in encodings]
+
+        # Enough neighbours that the runner-up identity is among them even
+        # when the best one contributes all its rows
+        k = min(len(self.names), 1 + self._widest)
+        if self.index is not None and self.index.is_trained:
+            distances, ids = self.index.search(encodings, k=k)
+        else:
+            all_distances = self.distances(encodings)
+            ids = np.argpartition(all_distances, k - 1, axis=1)[:, :k]
+            distances = np.take_along_axis(all_distances, ids, axis=1)
+            order = np.argsort(distances, axis=1)
+            ids = np.take_along_axis(ids, order, axis=1)
+            distances = np.take_along_axis(distances, order, axis=1)
+
+        matches = []
+        for row_distances, row_ids in zip(distances, ids):
+            best, distance = row_ids[0], float(row_distances[0])
+            if best < 0:
+                matches.append(Match("Unknown", float("inf"), float("inf")))
+                continue
+            runner_up = next((float(d) for d, i in zip(row_distances[1:], row_ids[1:])
+                              if i >= 0 and self.names[i] != self.names[best]), float("inf"))
+            name = self.names[best] if distance <= self.tolerance else "Unknown"
+            matches.append(Match(name, distance, runner_up - distance))
+        return matches
@@ -0,0 +1,154 @@
+import json
+import random
+import threading
+import time
+
+import numpy as np
+
+# Prometheus-style latency buckets, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Bucketed latency histogram plus a bounded reservoir for percentiles"""
+
+    def __init__(self, reservoir_size=4096):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.reservoir_size = reservoir_size
+        self.samples = []
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+        # Reservoir sampling keeps a uniform sample of every observation
+        if len(self.samples) < self.reservoir_size:
+            self.samples.append(seconds)
+        else:
+            slot = random.randrange(self.count)
+            if slot < self.reservoir_size:
+                self.samples[slot] = seconds
+
+    def percentiles(self, qs=(50, 95, 99)):
+        if not self.samples:
+            return {f"p{q}": 0.0 for q in qs}
+        return dict(zip((f"p{q}" for q in qs), np.percentile(self.samples, qs).tolist()))
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            **self.percentiles(),
+            "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], np.cumsum(self.counts).tolist())),
+        }
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Per-stage timing histograms and counters for the recognition path.
+
+    Use `with metrics.timer("detect"):` around a stage, observe() for
+    durations measured elsewhere (e.g. in a worker process) and count() for
+    frames and faces. A disabled instance hands out one shared no-op timer
+    and returns immediately from observe() and count(), so instrumentation
+    can stay in place at almost no cost.
+    """
+
+    def __init__(self, enabled=True, prefix="attendance"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def timer(self, stage):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "stages": {stage: h.to_dict() for stage, h in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {name} Time spent per recognition stage.", f"# TYPE {name} histogram"]
+        data = self.to_dict()
+        for stage, h in data["stages"].items():
+            for le, count in h["buckets"].items():
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {h["sum"]}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {h["count"]}')
+        for counter, value in data["counters"].items():
+            metric = f"{self.prefix}_{counter}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Export to a file: Prometheus text for .prom/.txt, JSON otherwise"""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w") as f:
+            f.write(text)
+
+
+NULL_METRICS = Metrics(enabled=False)
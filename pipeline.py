@@ -0,0 +1,759 @@
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime
+from functools import partial
+from itertools import chain
+
+import cv2
+import numpy as np
+
+from decode import FFmpegCapture, FrameRing, open_capture, shared_memory_budget
+from metrics import NULL_METRICS
+from quality import REASONS, QualityGate
+from regions import MultiScaleDetector
+from sampling import AdaptiveSampler, FrameSampler
+from tracking import FaceTracker
+
+_face_recognition = None
+_ring = None
+
+
+def _init_worker(ring_spec=None):
+    """Load the dlib models once per worker process and attach the shared frame ring"""
+    global _face_recognition, _ring
+    import face_recognition
+    _face_recognition = face_recognition
+    if ring_spec is not None:
+        _ring = FrameRing.attach(*ring_spec)
+
+
+def from_ring(items, work):
+    """Worker stage wrapper: look up frames that were sent as shared-ring slot numbers"""
+    return work([(index, _ring.slot(item) if isinstance(item, int) else item) for index, item in items])
+
+
+def find_and_encode(frames, model="hog", batch_size=8, timings=None, gate=None, counts=None):
+    """Detect and encode the faces in a list of RGB frames.
+
+    With the CNN detector all frames go through batch_face_locations, and
+    for either detector every face in every frame is encoded by a single
+    batched dlib compute_face_descriptor call instead of one per frame.
+    Returns (locations, encodings), each a list with one entry per frame.
+    Seconds spent detecting and encoding are added to the optional
+    timings dict under "detect" and "encode". gate and counts are passed
+    on to encode_faces.
+    """
+    if _face_recognition is None:
+        _init_worker()
+    start = time.perf_counter()
+
+    if model == "cnn" and len(frames) > 1:
+        locations = _face_recognition.batch_face_locations(list(frames), batch_size=batch_size)
+    else:
+        locations = [_face_recognition.face_locations(frame, model=model) for frame in frames]
+
+    detected = time.perf_counter()
+    if timings is not None:
+        timings["detect"] = timings.get("detect", 0.0) + detected - start
+
+    encodings = encode_faces(frames, locations, gate, counts)
+    if timings is not None:
+        timings["encode"] = timings.get("encode", 0.0) + time.perf_counter() - detected
+    return locations, encodings
+
+
+def encode_faces(frames, locations, gate=None, counts=None):
+    """Encode every face of every RGB frame with a single batched dlib call.
+
+    With a quality.QualityGate, faces it rejects are not encoded: their
+    encoding is None, and counts (one dict per frame) gets faces_checked,
+    faces_encoded and skipped_<reason> tallies.
+    """
+    if _face_recognition is None:
+        _init_worker()
+    api = _face_recognition.api
+
+    encodings = [[None] * len(locs) for locs in locations]
+    images, shapes, kept = [], [], []
+    for i, locs in enumerate(locations):
+        if not locs:
+            continue
+        detections = api.dlib.full_object_detections()
+        frame_kept = []
+        for j, landmarks in enumerate(api._raw_face_landmarks(frames[i], locs, model="small")):
+            reason = gate.check(frames[i], locs[j], landmarks) if gate is not None else None
+            if counts is not None:
+                key = f"skipped_{reason}" if reason else "faces_encoded"
+                counts[i]["faces_checked"] = counts[i].get("faces_checked", 0) + 1
+                counts[i][key] = counts[i].get(key, 0) + 1
+            if reason is None:
+                detections.append(landmarks)
+                frame_kept.append(j)
+        if frame_kept:
+            images.append(frames[i])
+            shapes.append(detections)
+            kept.append((i, frame_kept))
+
+    if not images:
+        return encodings
+    descriptors = api.face_encoder.compute_face_descriptor(images, shapes, 1)
+    for (i, frame_kept), frame_descriptors in zip(kept, descriptors):
+        for j, descriptor in zip(frame_kept, frame_descriptors):
+            encodings[i][j] = np.array(descriptor)
+    return encodings
+
+
+def detect_and_encode(items, model="hog", gate=None):
+    """Worker stage: find and encode the faces in a batch of downscaled frames.
+
+    Returns (index, locations, encodings, timings, counts) per frame, where
+    timings holds this frame's share of the batch's seconds per stage and
+    counts the quality gate's tallies for the frame.
+    """
+    start = time.perf_counter()
+    indices = [index for index, _ in items]
+
+    # dlib expects RGB, OpenCV decodes to BGR
+    frames = [small_frame[:, :, ::-1].copy() for _, small_frame in items]
+    timings = {"convert": time.perf_counter() - start}
+    counts = [{} for _ in items]
+    locations, encodings = find_and_encode(frames, model, len(frames), timings, gate, counts)
+
+    timings = {stage: seconds / len(items) for stage, seconds in timings.items()}
+    return list(zip(indices, locations, encodings, [timings] * len(items), counts))
+
+
+def detect_and_encode_multiscale(items, detector, gate=None):
+    """Worker stage for multi-scale detection: full-resolution frames in, full-resolution boxes out"""
+    start = time.perf_counter()
+    indices = [index for index, _ in items]
+    frames = [frame[:, :, ::-1].copy() for _, frame in items]
+    converted = time.perf_counter()
+
+    detections = [detector.detect(frame) for frame in frames]
+    detected = time.perf_counter()
+    # Encode from the full-resolution frames, not the downscaled ones
+    encodings = encode_faces(frames, [locs for locs, _ in detections], gate,
+                             [counts for _, counts in detections])
+
+    timings = {
+        "convert": (converted - start) / len(items),
+        "detect": (detected - converted) / len(items),
+        "encode": (time.perf_counter() - detected) / len(items),
+    }
+    return [(index, locs, encs, timings, counts)
+            for index, (locs, counts), encs in zip(indices, detections, encodings)]
+
+
+def batched(items, size):
+    """Group an iterable into lists of up to size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class StageStats:
+    """Busy time and frame count of one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.seconds = 0.0
+
+    def add(self, seconds, frames=1):
+        self.frames += frames
+        self.seconds += seconds
+
+    @property
+    def fps(self):
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self):
+        return f"{self.name}: {self.frames} frames, {self.fps:.1f} fps"
+
+
+class FrameResult:
+    """Recognition result for one analyzed frame"""
+
+    def __init__(self, index, frame, locations, names, newly_marked):
+        self.index = index
+        self.frame = frame
+        self.locations = locations
+        self.names = names
+        self.newly_marked = newly_marked
+
+
+def draw_faces(frame, locations, names, marked_today):
+    """Draw boxes and labels for recognized faces"""
+    for (top, right, bottom, left), name in zip(locations, names):
+        # Determine color based on attendance status
+        if name == "Unknown":
+            color = (0, 0, 255)  # Red for unknown
+        elif name in marked_today:
+            color = (0, 255, 255)  # Yellow for already marked
+        else:
+            color = (0, 255, 0)  # Green for new
+
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+
+        label = f"{name} ✓" if name != "Unknown" and name in marked_today else name
+        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+        cv2.rectangle(frame, (left, top - 25), (left + label_size[0], top), color, -1)
+        cv2.putText(frame, label, (left, top - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+
+
+def draw_progress(frame, stats_text, progress):
+    """Draw the stats panel and progress bar"""
+    width = frame.shape[1]
+
+    y_offset = 30
+    for i, text in enumerate(stats_text):
+        text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
+        cv2.rectangle(frame, (10, y_offset + i * 30 - 20),
+                      (20 + text_size[0], y_offset + i * 30 + 5), (0, 0, 0), -1)
+        cv2.putText(frame, text, (15, y_offset + i * 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+    bar_width = 400
+    bar_height = 20
+    bar_x = width - bar_width - 20
+    bar_y = 20
+    cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height), (50, 50, 50), -1)
+    fill_width = int((progress / 100) * bar_width)
+    cv2.rectangle(frame, (bar_x, bar_y), (bar_x + fill_width, bar_y + bar_height), (0, 255, 0), -1)
+    cv2.putText(frame, f"{progress:.1f}%", (bar_x + bar_width // 2 - 30, bar_y + 15),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+
+class VideoPipeline:
+    """Decode -> detect/encode -> match, mark and render.
+
+    The decoder runs in the pool's task-feeder thread, detection and
+    encoding run in a pool of worker processes that each load their own
+    dlib models, and results come back in frame order to the calling
+    thread, which matches them against the gallery, marks attendance and
+    renders. At most max_in_flight frames are decoded ahead of the result
+    stage. With workers=0 every stage runs in the calling process, as it
+    always does with tracking or adaptive sampling, whose state is
+    sequential. The options are listed on __init__; the README covers
+    each mode in more detail.
+    """
+
+    def __init__(self, attendance, workers=None, sample_fps=5, scale=4,
+                 render=True, on_frame=None, max_in_flight=None,
+                 tracking=False, keyframe_interval=5, tracker=None,
+                 adaptive=False, sampler=None, expected=None,
+                 batch_size=8, detection_model="hog", metrics=None,
+                 multiscale=False, rois=None, decoder="opencv", decode_threads=0,
+                 hw_decode=True, shared_frames=True, ring_slots=None, quality=True,
+                 announce=True):
+        """Options, by stage:
+
+        render, on_frame, announce: keep and draw frames (False runs headless);
+            on_frame(result) is called per analyzed frame, returning False stops;
+            announce=False doesn't print marks that are only provisional (batch.py)
+        sample_fps, adaptive, sampler, expected: fixed stride or an AdaptiveSampler;
+            stop as soon as every expected name is marked
+        decoder, decode_threads, hw_decode: OpenCV's FFmpeg backend, or "ffmpeg" to
+            have an ffmpeg subprocess scale to 1/scale when full frames aren't needed
+        shared_frames, ring_slots: send frames to workers through a FrameRing in
+            shared memory (default one batch per worker plus one, capped by /dev/shm)
+        batch_size, detection_model: frames per worker task; "cnn" batches detection too
+        tracking, keyframe_interval, tracker: detect on keyframes only and follow faces
+            with a FaceTracker in between, encoding only unconfirmed tracks
+        multiscale, rois: MultiScaleDetector with full-resolution passes around the
+            faces of the 1/scale pass and inside each ROI, encoding at full resolution
+        quality: True for a default QualityGate, a gate, or False to encode every face
+        metrics: a metrics.Metrics collecting per-stage latency histograms and counters
+        """
+        self.attendance = attendance
+        self.workers = os.cpu_count() if workers is None else workers
+        self.sampler = sampler or (AdaptiveSampler(sample_fps) if adaptive else FrameSampler(sample_fps))
+        self.expected = set(expected) if expected is not None else None
+        self.tracker = None
+        if tracking:
+            self.tracker = tracker or FaceTracker()
+            self.keyframe_interval = keyframe_interval
+            self.workers = 0
+        if isinstance(self.sampler, AdaptiveSampler):
+            # With frames in flight in workers or waiting in a batch the
+            # sampler would hear about a frame long after deciding on the next
+            self.workers = 0
+            batch_size = 1
+        self.scale = scale
+        self.render = render
+        self.on_frame = on_frame
+        self.announce = announce
+        self.batch_size = batch_size
+        self.detection_model = detection_model
+        self.metrics = metrics or NULL_METRICS
+        self.detector = None
+        if (multiscale or rois) and self.tracker is None:
+            self.detector = MultiScaleDetector(scale, rois or (), model=detection_model)
+        self.gate = QualityGate() if quality is True else (quality or None)
+        self.detection = {}
+        self.decoder = decoder
+        self.decode_threads = decode_threads
+        self.hw_decode = hw_decode
+        self.shared_frames = shared_frames
+        # Enough for every worker's batch plus the one being filled
+        self.ring_slots = ring_slots or (self.workers + 1) * batch_size
+        self._decoded_scale = 1
+        self._ring = None
+        self._ring_cursor = 0
+        self._ring_free = None
+        self._ring_frames = set()
+        # A batch can only be dispatched once it is full, so at least one
+        # batch worth of frames must be allowed in flight
+        self.max_in_flight = max(max_in_flight or max(2, 2 * self.workers) * batch_size, batch_size)
+
+        self.total_frames = 0
+        self.frame_count = 0
+        self.frames_decoded = 0
+        self.frames_skipped = 0
+        self.stopped_early = False
+        self.faces_seen = 0
+        self.marked_today = set()
+        self.stages = {name: StageStats(name) for name in ("decode", "recognize", "results")}
+        self.latencies = []
+        self._frames = {}
+        self._captured = {}
+        self._slots = threading.Semaphore(self.max_in_flight)
+        self._stopped = False
+
+    def _decode(self, cap):
+        """Yield downscaled frames to analyze, keeping originals for rendering"""
+        self.sampler.start(cap.get(cv2.CAP_PROP_FPS) or 25)
+        metrics = self.metrics
+        # Decode straight into the shared ring when the decoded frame is what
+        # the workers get and nothing keeps it around for drawing
+        shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+        into_ring = self._ring is not None and not self.render and self._ring.shape == shape
+
+        while not self._stopped:
+            self._slots.acquire()
+            in_ring = into_ring and self._reserve_slot()
+            start = time.perf_counter()
+            frame = None
+            while not self._stopped:
+                # Skip to the next sample without decoding the frames in between
+                for _ in range(self.sampler.stride - 1):
+                    if not cap.grab():
+                        break
+                    self.frame_count += 1
+                    self.frames_skipped += 1
+                    metrics.count("frames_skipped")
+
+                ret, frame = cap.read(self._ring.slot(self._ring_cursor) if in_ring else None)
+                if not ret:
+                    frame = None
+                    break
+                self.frame_count += 1
+                self.frames_decoded += 1
+                metrics.count("frames_decoded")
+                if self.sampler.should_analyze(frame, self.frame_count):
+                    break
+
+            if frame is None:
+                self._slots.release()
+                if in_ring:
+                    self._ring_free.release()
+                return
+            metrics.observe("decode", time.perf_counter() - start)
+            yield self._prepare(self.frame_count, frame, start, in_ring)
+
+    def _stream(self, reader):
+        """Yield the newest captured frame whenever a slot frees up.
+
+        Frames captured while every slot is busy are dropped by the reader
+        rather than queued, so latency stays bounded by the recognizer.
+        """
+        last = -1
+        while not self._stopped:
+            self._slots.acquire()
+            item = reader.read(after=last, timeout=1.0)
+            while item is None and not reader.ended and not self._stopped:
+                item = reader.read(after=last, timeout=1.0)
+            if item is None:
+                self._slots.release()
+                return
+
+            start = time.perf_counter()
+            last, frame, captured = item
+            self.frame_count = last
+            self.frames_decoded += 1
+            self.metrics.count("frames_decoded")
+            self._captured[last] = captured
+            yield self._prepare(last, frame, start)
+
+    def _prepare(self, index, frame, start, in_ring=False):
+        """Get a frame ready for the workers, keeping the original for rendering.
+
+        Frames are downscaled for detection unless the decoder already did
+        that or the multi-scale detector wants the full frame. With a shared
+        frame ring the result is written into the next free slot and only
+        the slot number is passed on; when every slot is taken the frame is
+        passed on as is.
+        """
+        if self.render:
+            self._frames[index] = frame
+        ring = self._ring
+        if in_ring:
+            item = self._claim_slot(index)
+        elif self.detector is None and self._decoded_scale != self.scale:
+            height, width = frame.shape[:2]
+            size = (width // self.scale, height // self.scale)
+            with self.metrics.timer("resize"):
+                if ring is not None and ring.shape == (size[1], size[0], 3) and self._reserve_slot():
+                    cv2.resize(frame, size, dst=ring.slot(self._ring_cursor))
+                    item = self._claim_slot(index)
+                else:
+                    item = cv2.resize(frame, size)
+        elif ring is not None and ring.shape == frame.shape and self._reserve_slot():
+            np.copyto(ring.slot(self._ring_cursor), frame)
+            item = self._claim_slot(index)
+        else:
+            item = frame
+        self.stages["decode"].add(time.perf_counter() - start)
+        return index, item
+
+    def _reserve_slot(self):
+        """Take a free ring slot without waiting; False when they are all in flight"""
+        return self._ring_free.acquire(blocking=False)
+
+    def _claim_slot(self, index):
+        """Hand out the reserved ring slot for frame index.
+
+        Slots are claimed and (in _handle) released in frame order, so the
+        round-robin cursor always lands on the slot freed longest ago.
+        """
+        slot = self._ring_cursor % self._ring.slots
+        self._ring_cursor += 1
+        self._ring_frames.add(index)
+        return slot
+
+    def _track_frame(self, item):
+        """Tracking stage: detect on keyframes, propagate in between, encode only uncertain tracks"""
+        if _face_recognition is None:
+            _init_worker()
+        index, small_frame = item
+        timings = {}
+        start = time.perf_counter()
+
+        rgb = small_frame[:, :, ::-1].copy()
+        if self.stages["recognize"].frames % self.keyframe_interval == 0:
+            locations = _face_recognition.face_locations(rgb, model=self.detection_model)
+            detected = time.perf_counter()
+            timings["detect"] = detected - start
+            tracks = self.tracker.update(locations, small_frame)
+        else:
+            detected = start
+            tracks = self.tracker.propagate(small_frame)
+        timings["track"] = time.perf_counter() - detected
+
+        pending = self.tracker.needs_encoding(tracks)
+        counts = {}
+        if pending:
+            encode_start = time.perf_counter()
+            encodings = encode_faces([rgb], [[track.box for track in pending]], self.gate, [counts])[0]
+            matched = time.perf_counter()
+            for track, encoding, match in zip(pending, encodings, self.attendance.matcher.match(encodings)):
+                # Skipped faces don't vote, but count as an attempt on the track
+                if encoding is not None:
+                    self.tracker.record(track, match.name)
+                else:
+                    self.tracker.reject(track)
+            timings["encode"] = matched - encode_start
+            timings["match"] = time.perf_counter() - matched
+
+        names = [self.tracker.name(track) for track in tracks]
+        return index, [track.box for track in tracks], names, timings, counts
+
+    def _handle(self, index, locations, faces):
+        """Result stage: match, mark attendance and render one frame.
+
+        faces are encodings to match, or names already resolved by the tracker.
+        """
+        start = time.perf_counter()
+        metrics = self.metrics
+        if self.tracker is None:
+            with metrics.timer("match"):
+                matches = self.attendance.matcher.match(faces)
+            names = [match.name for match in matches]
+        else:
+            names = faces
+        self.faces_seen += len(names)
+        metrics.count("frames_analyzed")
+        metrics.count("faces", len(names))
+        metrics.count("faces_unknown", names.count("Unknown"))
+        scale = 1 if self.detector is not None else self.scale
+        locations = [(top * scale, right * scale, bottom * scale, left * scale)
+                     for (top, right, bottom, left) in locations]
+
+        already_marked = set(self.marked_today)
+        newly_marked = []
+        for name in names:
+            if name != "Unknown" and name not in self.marked_today:
+                if self.attendance.mark_attendance(name):
+                    newly_marked.append(name)
+                    metrics.count("marks")
+                    if self.announce:
+                        print(f"✓ Attendance marked for {name}")
+                self.marked_today.add(name)
+        self.sampler.observe(len(names), newly_marked)
+
+        frame = self._frames.pop(index, None)
+        if frame is not None:
+            draw_start = time.perf_counter()
+            draw_faces(frame, locations, names, already_marked)
+            progress = self.progress(index)
+            stats_text = [
+                f"Progress: {progress:.1f}%",
+                f"Marked Today: {len(self.marked_today)}",
+                f"Frame: {index}/{self.total_frames}",
+            ]
+            if newly_marked:
+                stats_text.append(f"New: {', '.join(newly_marked)}")
+            draw_progress(frame, stats_text, progress)
+            metrics.observe("draw", time.perf_counter() - draw_start)
+
+        self._slots.release()
+        if index in self._ring_frames:
+            self._ring_frames.discard(index)
+            self._ring_free.release()
+        result = FrameResult(index, frame, locations, names, newly_marked)
+        self.stages["results"].add(time.perf_counter() - start)
+
+        captured = self._captured.pop(index, None)
+        if captured is not None:
+            self.latencies.append(time.perf_counter() - captured)
+            metrics.observe("end_to_end", self.latencies[-1])
+        return result
+
+    def progress(self, index):
+        return (index / self.total_frames) * 100 if self.total_frames else 0.0
+
+    def run(self, video_path):
+        """Process a video file; returns a summary dict"""
+        if self.decoder == "ffmpeg" and FFmpegCapture.available():
+            # Let ffmpeg scale unless full frames are needed for drawing or multi-scale detection
+            scale = self.scale if not self.render and self.detector is None else 1
+            cap = FFmpegCapture(video_path, scale, self.decode_threads, self.hw_decode)
+        else:
+            cap = open_capture(video_path, self.decode_threads, self.hw_decode)
+        if not cap.isOpened():
+            raise IOError(f"Cannot open video: {video_path}")
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self._decoded_scale = getattr(cap, "scale", 1)
+
+        ring = None
+        height, width = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        if self.detector is None and self._decoded_scale != self.scale:
+            height, width = height // self.scale, width // self.scale
+        if self.shared_frames and self.workers > 0 and self.tracker is None and height and width:
+            # The ring gets its own, smaller limit than max_in_flight and has
+            # to fit in /dev/shm; frames beyond it are pickled instead
+            slots = min(self.ring_slots, self.max_in_flight)
+            budget = shared_memory_budget()
+            if budget is not None:
+                slots = min(slots, budget // (height * width * 3))
+            if slots > 0:
+                try:
+                    ring = FrameRing(slots, (height, width, 3))
+                except OSError:
+                    ring = None
+        try:
+            return self._run(self._decode(cap), ring)
+        finally:
+            cap.release()
+
+    def run_stream(self, reader):
+        """Process a live source (see stream.LatestFrameReader) until it ends or is stopped.
+
+        Only one frame per worker is in flight, so the recognizer always
+        works on the newest frame. The summary includes end-to-end latency
+        from capture to marked attendance. Frames are not batched here,
+        since waiting for a batch to fill would add latency.
+        """
+        self._slots = threading.Semaphore(max(1, self.workers))
+        self.batch_size = 1
+        try:
+            summary = self._run(self._stream(reader))
+        finally:
+            reader.close()
+        summary["frames_captured"] = reader.captured
+        summary["frames_dropped"] = reader.dropped
+        return summary
+
+    def stop(self):
+        """Ask a running pipeline to finish after the current frame"""
+        self._stopped = True
+
+    def _run(self, frames, ring=None):
+        today = datetime.now().strftime("%Y-%m-%d")
+        self.marked_today = set(self.attendance.attendance.get(today, {}))
+
+        pool = None
+        self._ring = ring
+        self._ring_cursor = 0
+        self._ring_frames = set()
+        if ring is not None:
+            self._ring_free = threading.Semaphore(ring.slots)
+        start = time.perf_counter()
+        try:
+            if self.tracker is not None:
+                results = map(self._track_frame, frames)
+            else:
+                if self.detector is not None:
+                    work = partial(detect_and_encode_multiscale, detector=self.detector, gate=self.gate)
+                else:
+                    work = partial(detect_and_encode, model=self.detection_model, gate=self.gate)
+                batches = batched(frames, self.batch_size)
+                if self.workers > 0:
+                    if ring is not None:
+                        work = partial(from_ring, work=work)
+                    pool = multiprocessing.Pool(self.workers, initializer=_init_worker,
+                                                initargs=(ring.spec if ring is not None else None,))
+                    results = chain.from_iterable(pool.imap(work, batches))
+                else:
+                    results = chain.from_iterable(map(work, batches))
+
+            for index, locations, faces, timings, counts in results:
+                self.stages["recognize"].add(sum(timings.values()))
+                for stage, seconds in timings.items():
+                    self.metrics.observe(stage, seconds)
+                for key, value in counts.items():
+                    self.detection[key] = self.detection.get(key, 0) + value
+                    if key.startswith("skipped_"):
+                        self.metrics.count(key, value)
+                result = self._handle(index, locations, faces)
+                if self.on_frame is not None:
+                    with self.metrics.timer("display"):
+                        keep_going = self.on_frame(result)
+                    if keep_going is False:
+                        self._stopped = True
+                        break
+                if self.expected is not None and self.expected <= self.marked_today:
+                    self.stopped_early = True
+                    break
+                if self._stopped:
+                    break
+        finally:
+            self._stopped = True
+            # Wake the decoder if it is waiting for a free slot
+            self._slots.release()
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            if ring is not None:
+                ring.close()
+                self._ring = None
+            self._frames.clear()
+
+        return self.summary(time.perf_counter() - start)
+
+    def summary(self, elapsed):
+        processed = self.stages["results"].frames
+        recognize = self.stages["recognize"]
+        summary = {
+            "elapsed": elapsed,
+            "frames_read": self.frame_count,
+            "frames_decoded": self.frames_decoded,
+            "frames_skipped": self.frames_skipped,
+            "stopped_early": self.stopped_early,
+            "total_frames": self.total_frames,
+            "processed_frames": processed,
+            "fps": processed / elapsed if elapsed > 0 else 0.0,
+            "faces_seen": self.faces_seen,
+            "workers": self.workers,
+            "scale": self.scale,
+            "marked": sorted(self.marked_today),
+            "stage_fps": {
+                "decode": self.stages["decode"].fps,
+                # Workers run concurrently, so the stage throughput is the
+                # per-worker rate times the number of workers
+                "recognize": recognize.fps * max(1, self.workers),
+                "results": self.stages["results"].fps,
+            },
+        }
+        if self.tracker is not None:
+            summary["tracking"] = self.tracker.summary()
+        counts = self.detection
+        if "detector_pixels" in counts:
+            summary["multiscale"] = dict(
+                {key: counts[key] for key in ("frames", "coarse_faces", "extra_faces",
+                                              "detector_pixels", "full_res_pixels")},
+                rois=len(self.detector.rois),
+                pixel_share=counts["detector_pixels"] / max(1, counts["full_res_pixels"]),
+                recall_gain=counts["extra_faces"] / max(1, counts["coarse_faces"]),
+            )
+        if self.gate is not None:
+            summary["quality"] = {
+                "faces_checked": counts.get("faces_checked", 0),
+                "faces_encoded": counts.get("faces_encoded", 0),
+                "skipped": {reason: counts.get("skipped_" + reason, 0) for reason in REASONS},
+            }
+        if self.latencies:
+            p50, p95, p99 = np.percentile(self.latencies, [50, 95, 99]) * 1000
+            summary["latency_ms"] = {"p50": p50, "p95": p95, "p99": p99, "max": max(self.latencies) * 1000}
+        if self.metrics.enabled:
+            summary["metrics"] = self.metrics.to_dict()
+        return summary
+
+
+def format_summary(summary):
+    """Human-readable report of a pipeline run"""
+    stage_fps = summary["stage_fps"]
+    text = (f"Processing Time: {summary['elapsed']:.1f} seconds\n"
+            f"Processed Frames: {summary['processed_frames']}"
+            f"{'/' + str(summary['total_frames']) if summary['total_frames'] else ''}\n"
+            f"  Decoded: {summary['frames_decoded']}, skipped without decoding: {summary['frames_skipped']}"
+            f"{' (stopped early: everyone marked)' if summary['stopped_early'] else ''}\n"
+            f"Average FPS: {summary['fps']:.1f} ({summary['workers']} workers)\n"
+            f"People Marked: {len(summary['marked'])}\n"
+            f"\n"
+            f"Stage throughput (frames/sec):\n"
+            f"  Decode: {stage_fps['decode']:.1f}\n"
+            f"  Detect + encode: {stage_fps['recognize']:.1f}\n"
+            f"  Match + mark + draw: {stage_fps['results']:.1f}")
+    tracking = summary.get("tracking")
+    if tracking:
+        text += (f"\n\nTracking: {tracking['tracks']} tracks, {tracking['keyframes']} keyframes\n"
+                 f"  Encoder calls: {tracking['encoder_calls']} "
+                 f"({tracking['encoder_calls_saved']} saved of {tracking['face_observations']} faces, "
+                 f"{tracking['gate_rejections']} skipped by the quality gate, "
+                 f"{tracking['deduplicated']} unmoved since the last attempt)")
+    quality = summary.get("quality")
+    if quality and quality["faces_checked"]:
+        skipped = ", ".join(f"{n} {reason.replace('_', ' ')}"
+                            for reason, n in quality["skipped"].items() if n) or "none"
+        text += (f"\n\nQuality gate: {quality['faces_encoded']} of {quality['faces_checked']} faces encoded\n"
+                 f"  Skipped: {skipped}")
+    multiscale = summary.get("multiscale")
+    if multiscale:
+        text += (f"\n\nMulti-scale detection ({multiscale['rois']} ROIs):\n"
+                 f"  Detector cost: {multiscale['pixel_share']:.0%} of full-resolution detection "
+                 f"({1 - multiscale['pixel_share']:.0%} saved)\n"
+                 f"  Faces found only at full resolution: {multiscale['extra_faces']} "
+                 f"(+{multiscale['recall_gain']:.0%} over the 1/{summary.get('scale', 4)} pass)")
+    latency = summary.get("latency_ms")
+    if latency:
+        if "frames_dropped" in summary:
+            text += (f"\n\nStream: {summary['frames_captured']} frames captured, "
+                     f"{summary['frames_dropped']} stale frames dropped")
+        text += (f"\n\nLatency (capture to marked): p50 {latency['p50']:.0f} ms, "
+                 f"p95 {latency['p95']:.0f} ms, p99 {latency['p99']:.0f} ms")
+    metrics = summary.get("metrics")
+    if metrics and metrics["stages"]:
+        text += "\n\nStage latency (ms):"
+        for stage, h in metrics["stages"].items():
+            text += (f"\n  {stage}: p50 {h['p50'] * 1000:.1f}, p95 {h['p95'] * 1000:.1f}, "
+                     f"p99 {h['p99'] * 1000:.1f} (n={h['count']})")
+    return text
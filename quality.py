@@ -0,0 +1,80 @@
+import numpy as np
+
+from lazy import LazyModule
+
+# A gate can be created without loading OpenCV; it is imported on the first check
+cv2 = LazyModule("cv2")
+
+REASONS = ("too_small", "too_dark", "too_bright", "blurry", "profile")
+
+
+def landmark_points(landmarks):
+    """(x, y) points of a dlib full_object_detection, or a list of points as is"""
+    if hasattr(landmarks, "num_parts"):
+        return [(landmarks.part(i).x, landmarks.part(i).y) for i in range(landmarks.num_parts)]
+    return list(landmarks)
+
+
+def yaw_ratio(points):
+    """Horizontal nose offset from between the eyes, in eye distances.
+
+    Uses dlib's 5-point layout (right eye corners, left eye corners, nose
+    tip). Roughly 0 for a frontal face and about half of tan(yaw) as the
+    head turns, so 0.45 is around 40 degrees.
+    """
+    right_eye = np.mean(points[0:2], axis=0)
+    left_eye = np.mean(points[2:4], axis=0)
+    eye_distance = np.linalg.norm(left_eye - right_eye)
+    if eye_distance < 1:
+        return float("inf")
+    return abs(points[4][0] - (left_eye[0] + right_eye[0]) / 2) / eye_distance
+
+
+def sharpness(gray):
+    """Variance of the Laplacian on a fixed-size crop (higher is sharper)"""
+    return cv2.Laplacian(cv2.resize(gray, (64, 64)), cv2.CV_64F).var()
+
+
+class QualityGate:
+    """Cheap checks run on a detected face before the expensive 128-d encoder.
+
+    check() returns the first failed reason, cheapest test first: box
+    smaller than min_size pixels, mean brightness outside the brightness
+    range, Laplacian variance below min_sharpness (blur or motion smear),
+    and, when landmarks are given, a head turned further than max_yaw.
+    Faces that fail are not encoded; in a video the same person is simply
+    tried again on a later frame. Sizes are in pixels of the image being
+    encoded: the downscaled frame in the video pipeline, or the
+    full-resolution frame on the multi-scale path, where the small faces
+    found by the full-resolution passes are exactly the ones to keep.
+    """
+
+    def __init__(self, min_size=20, brightness=(35, 225), min_sharpness=15.0, max_yaw=0.45):
+        self.min_size = min_size
+        self.brightness = brightness
+        self.min_sharpness = min_sharpness
+        self.max_yaw = max_yaw
+
+    def check(self, image, box, landmarks=None):
+        """Reason to skip this face (one of REASONS), or None if it is worth encoding"""
+        top, right, bottom, left = box
+        if min(bottom - top, right - left) < self.min_size:
+            return "too_small"
+
+        crop = image[max(0, top):bottom, max(0, left):right]
+        if crop.size == 0:
+            return "too_small"
+        gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY) if crop.ndim == 3 else crop
+        mean = gray.mean()
+        if mean < self.brightness[0]:
+            return "too_dark"
+        if mean > self.brightness[1]:
+            return "too_bright"
+        if sharpness(gray) < self.min_sharpness:
+            return "blurry"
+
+        if landmarks is not None:
+            points = landmark_points(landmarks)
+            if len(points) == 5 and yaw_ratio(points) > self.max_yaw:
+                return "profile"
+        return None
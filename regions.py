@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+
+from tracking import iou
+
+
+def parse_roi(text):
+    """Parse 'x,y,w,h' as fractions of the frame (or pixels if any value is above 1)"""
+    values = tuple(float(v) for v in text.split(","))
+    if len(values) != 4:
+        raise ValueError(f"ROI must be x,y,w,h: {text}")
+    return values
+
+
+def roi_box(roi, shape):
+    """ROI as a (top, right, bottom, left) box clipped to a frame of this shape"""
+    height, width = shape[:2]
+    x, y, w, h = roi
+    if max(roi) <= 1:
+        x, w, y, h = x * width, w * width, y * height, h * height
+    return max(0, int(y)), min(width, int(x + w)), min(height, int(y + h)), max(0, int(x))
+
+
+def pad_box(box, pad, shape):
+    """Grow a box by pad times its size on every side, clipped to the frame"""
+    height, width = shape[:2]
+    top, right, bottom, left = box
+    dy, dx = int((bottom - top) * pad), int((right - left) * pad)
+    return max(0, top - dy), min(width, right + dx), min(height, bottom + dy), max(0, left - dx)
+
+
+def box_area(box):
+    top, right, bottom, left = box
+    return max(0, bottom - top) * max(0, right - left)
+
+
+class MultiScaleDetector:
+    """Coarse detection on a downscaled frame, full resolution only where it pays.
+
+    The whole frame is searched once at 1/scale. Every face found there is
+    re-detected at full resolution inside a padded window around it, which
+    gives an exact box for encoding. Each configured ROI (e.g. the door or
+    the back rows, as x,y,w,h fractions of the frame) is additionally
+    searched at full resolution with upsample, so faces too small for the
+    coarse pass are still found. Boxes are returned in full-resolution
+    coordinates.
+
+    detect() also returns counters: detector cost in upsampled pixels
+    (dlib doubles each side per upsample step) next to the cost of
+    searching the full frame at full resolution, and how many faces were
+    found only by the full-resolution ROI passes.
+    """
+
+    def __init__(self, scale=4, rois=(), pad=0.5, upsample=1, model="hog", iou_threshold=0.3):
+        self.scale = scale
+        self.rois = list(rois)
+        self.pad = pad
+        self.upsample = upsample
+        self.model = model
+        self.iou_threshold = iou_threshold
+
+    def _detect_in(self, frame, window, upsample):
+        import face_recognition
+
+        top, right, bottom, left = window
+        if bottom <= top or right <= left:
+            return []
+        crop = np.ascontiguousarray(frame[top:bottom, left:right])
+        return [(t + top, r + left, b + top, l + left) for t, r, b, l in
+                face_recognition.face_locations(crop, upsample, model=self.model)]
+
+    def detect(self, frame):
+        """Find faces in a full-resolution RGB frame; returns (locations, counts)"""
+        import face_recognition
+
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (width // self.scale, height // self.scale))
+        coarse = face_recognition.face_locations(small, model=self.model)
+        # face_locations upsamples once by default
+        pixels = small.shape[0] * small.shape[1] * 4
+
+        boxes = []
+        for box in coarse:
+            scaled = tuple(v * self.scale for v in box)
+            window = pad_box(scaled, self.pad, frame.shape)
+            pixels += box_area(window)
+            # Faces found at 1/scale are large at full size, so no upsampling
+            found = self._detect_in(frame, window, 0)
+            boxes.extend(found or [scaled])
+        found_coarse = len(boxes)
+
+        for roi in self.rois:
+            window = roi_box(roi, frame.shape)
+            pixels += box_area(window) * 4 ** self.upsample
+            boxes.extend(self._detect_in(frame, window, self.upsample))
+
+        # Keep the first of any overlapping boxes, so coarse hits win over ROI hits
+        locations, extra = [], 0
+        for i, box in enumerate(boxes):
+            if all(iou(box, kept) < self.iou_threshold for kept in locations):
+                locations.append(box)
+                extra += i >= found_coarse
+
+        counts = {
+            "frames": 1,
+            "coarse_faces": found_coarse,
+            "extra_faces": extra,
+            "detector_pixels": pixels,
+            "full_res_pixels": height * width * 4,
+        }
+        return locations, counts
@@ -0,0 +1,146 @@
+"""Attendance reports over the SQLite history: per-person rates, absences, CSV export
+
+Dates are YYYY-MM-DD; --from and --to are inclusive and default to the
+whole history. An attendance day is any day on which anyone was marked.
+
+Examples:
+    python reports.py person saleh
+    python reports.py rates --from 2024-01-01 --to 2024-06-30 --below 0.8
+    python reports.py absent --from 2024-01-15 --to 2024-01-19
+    python reports.py marks --from 2024-01-01 --csv marks.csv
+"""
+import argparse
+import csv
+import sys
+from datetime import datetime
+
+from attendance_store import AttendanceStore
+
+RATE_COLUMNS = ("name", "present", "days", "rate", "last_seen")
+MARK_COLUMNS = ("date", "name", "time")
+
+
+def parse_date(text):
+    """argparse type (and GUI check) for a YYYY-MM-DD date"""
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a YYYY-MM-DD date, got {text!r}")
+
+
+class AttendanceReports:
+    """Cross-day questions answered from the store's indexes and rollups.
+
+    roster is everyone who should be attending (normally the names in the
+    faces folder); people on it who were never marked in a range get a 0%
+    rate and are listed as absent. Nothing here loads the full history.
+    """
+
+    def __init__(self, store, roster=()):
+        self.store = store
+        self.roster = set(roster)
+
+    def person(self, name, start=None, end=None):
+        """One person's rate over [start, end] plus the dates and times they were marked"""
+        marks = self.store.person(name, start, end)
+        days = self.store.day_count(start, end)
+        return {
+            "name": name,
+            "present": len(marks),
+            "days": days,
+            "rate": len(marks) / days if days else 0.0,
+            "last_seen": marks[-1][0] if marks else "",
+            "marks": marks,
+        }
+
+    def rates(self, start=None, end=None, below=None):
+        """Attendance rate of everyone on the roster or marked in [start, end], lowest first"""
+        days = self.store.day_count(start, end)
+        presence = self.store.presence(start, end)
+        rows = []
+        for name in self.roster | set(presence):
+            present, last_seen = presence.get(name, (0, ""))
+            rate = present / days if days else 0.0
+            if below is None or rate < below:
+                rows.append({"name": name, "present": present, "days": days,
+                             "rate": rate, "last_seen": last_seen})
+        rows.sort(key=lambda row: (row["rate"], row["name"]))
+        return rows
+
+    def absent(self, start=None, end=None):
+        """Roster names not marked on any day in [start, end]"""
+        return sorted(self.roster - set(self.store.presence(start, end)))
+
+    def marks(self, start=None, end=None):
+        """Raw marks in [start, end] as dicts, by date and marking order"""
+        return [dict(zip(MARK_COLUMNS, row)) for row in self.store.marks(start, end)]
+
+
+def write_csv(rows, columns, file):
+    """Write report rows (dicts) as CSV to an open file"""
+    writer = csv.DictWriter(file, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(dict(row, rate=f"{row['rate']:.3f}") if "rate" in row else row)
+
+
+def export_csv(rows, columns, path):
+    with open(path, "w", newline="") as f:
+        write_csv(rows, columns, f)
+
+
+def format_rates(rows):
+    lines = [f"{'Name':<24} {'Present':>8} {'Rate':>6}  Last seen"]
+    for row in rows:
+        lines.append(f"{row['name']:<24} {row['present']:>4}/{row['days']:<3} {row['rate']:>6.0%}  "
+                     f"{row['last_seen'] or '-'}")
+    return "\n".join(lines)
+
+
+def main():
+    from face_store import EncodingStore
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.splitlines()[2:]))
+    parser.add_argument("report", choices=("person", "rates", "absent", "marks"))
+    parser.add_argument("name", nargs="?", help="person to report on (person report)")
+    parser.add_argument("--from", dest="start", type=parse_date, help="first date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=parse_date, help="last date (YYYY-MM-DD)")
+    parser.add_argument("--below", type=float, help="rates: only people under this rate (0-1)")
+    parser.add_argument("--csv", help="write the report to this CSV file (- for stdout) instead of printing it")
+    parser.add_argument("--db", default="attendance.db")
+    parser.add_argument("--faces", default="faces", help="gallery folder the roster is read from")
+    args = parser.parse_args()
+    if args.report == "person" and not args.name:
+        parser.error("the person report needs a name")
+
+    reports = AttendanceReports(AttendanceStore(args.db), EncodingStore(args.faces).names())
+    if args.report == "person":
+        person = reports.person(args.name, args.start, args.end)
+        rows = [{"date": date, "name": args.name, "time": time} for date, time in person["marks"]]
+        columns = MARK_COLUMNS
+        text = (f"{person['name']}: present {person['present']} of {person['days']} days "
+                f"({person['rate']:.0%}), last seen {person['last_seen'] or 'never'}\n" +
+                "\n".join(f"  {date}  {time}" for date, time in person["marks"]))
+    elif args.report == "rates":
+        rows, columns = reports.rates(args.start, args.end, args.below), RATE_COLUMNS
+        text = format_rates(rows)
+    elif args.report == "absent":
+        rows, columns = [{"name": name} for name in reports.absent(args.start, args.end)], ("name",)
+        text = "\n".join(row["name"] for row in rows) or "Nobody on the roster was absent"
+    else:
+        rows, columns = reports.marks(args.start, args.end), MARK_COLUMNS
+        text = "\n".join(f"{row['date']}  {row['time']}  {row['name']}" for row in rows)
+
+    if args.csv == "-":
+        write_csv(rows, columns, sys.stdout)
+    elif args.csv:
+        export_csv(rows, columns, args.csv)
+        print(f"✓ Wrote {len(rows)} rows to {args.csv}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
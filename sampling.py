@@ -0,0 +1,81 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+class FrameSampler:
+    """Fixed-stride sampling: analyze one frame every `stride` frames"""
+
+    def __init__(self, sample_fps=5):
+        self.sample_fps = sample_fps
+        self.base_stride = 1
+        self.stride = 1
+
+    def start(self, fps):
+        self.base_stride = max(1, int(fps // self.sample_fps))
+        self.stride = self.base_stride
+
+    def should_analyze(self, frame, frame_index):
+        return True
+
+    def observe(self, face_count, newly_marked):
+        pass
+
+
+class AdaptiveSampler(FrameSampler):
+    """Sample densely while something happens, sparsely while the scene is static.
+
+    Every probed frame is compared with the last analyzed one on a tiny
+    grayscale thumbnail. Frames that barely changed are decoded but not
+    analyzed, and the stride between probes doubles up to max_seconds of
+    video. Motion, a change in the number of faces, or a newly marked
+    person drops the stride back to the base rate. A frame is analyzed at
+    least every max_seconds so nobody is missed during a long static spell.
+
+    The decoder calls should_analyze and the result stage calls observe,
+    possibly from different threads, so both take a lock. The feedback is
+    only timely when results come back right after their frame is decoded,
+    which is why VideoPipeline runs adaptive sampling in-process.
+    """
+
+    def __init__(self, sample_fps=5, max_seconds=2.0, motion_threshold=3.0, thumbnail=(64, 36)):
+        super().__init__(sample_fps)
+        self.max_seconds = max_seconds
+        self.motion_threshold = motion_threshold
+        self.thumbnail = thumbnail
+        self.max_stride = 1
+        self._last_thumb = None
+        self._last_analyzed = 0
+        self._last_face_count = 0
+        self._busy = True
+        self._lock = threading.Lock()
+
+    def start(self, fps):
+        super().start(fps)
+        self.max_stride = max(self.base_stride, int(fps * self.max_seconds))
+
+    def should_analyze(self, frame, frame_index):
+        thumb = cv2.cvtColor(cv2.resize(frame, self.thumbnail, interpolation=cv2.INTER_AREA),
+                             cv2.COLOR_BGR2GRAY).astype(np.int16)
+        with self._lock:
+            moved = self._last_thumb is None or \
+                np.abs(thumb - self._last_thumb).mean() > self.motion_threshold
+            idle = frame_index - self._last_analyzed >= self.max_stride
+
+            if moved or self._busy:
+                self.stride = self.base_stride
+            else:
+                self.stride = min(2 * self.stride, self.max_stride)
+
+            if moved or self._busy or idle:
+                self._last_thumb = thumb
+                self._last_analyzed = frame_index
+                return True
+            return False
+
+    def observe(self, face_count, newly_marked):
+        """Feedback from the result stage"""
+        with self._lock:
+            self._busy = bool(newly_marked) or face_count != self._last_face_count
+            self._last_face_count = face_count
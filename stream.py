@@ -0,0 +1,144 @@
+"""Live attendance from a webcam or RTSP camera
+
+Examples:
+    python stream.py 0
+    python stream.py rtsp://door-cam.local/stream --headless
+    python stream.py lecture.mp4 --realtime --duration 60   # file as a stand-in camera
+    python stream.py 0 --metrics stream.prom                 # stage latencies as Prometheus text
+"""
+import argparse
+import threading
+import time
+
+import cv2
+
+from matcher import DEFAULT_TOLERANCE
+from metrics import Metrics
+from regions import parse_roi
+from pipeline import VideoPipeline, format_summary
+
+
+class LatestFrameReader:
+    """Capture thread that always holds only the newest frame.
+
+    The thread reads from the source as fast as it delivers frames and
+    overwrites the previous one, so a slow consumer sees fresh frames and
+    stale ones are counted as dropped instead of queuing up. Each frame is
+    stamped with its capture time for latency measurement.
+
+    source is a webcam index, an RTSP/HTTP URL or a file path. With
+    realtime=True a file is paced at its native frame rate, which makes it
+    a stand-in for a live camera in tests.
+    """
+
+    def __init__(self, source, realtime=False):
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        self.source = source
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open stream: {source}")
+        # Keep the backend's own buffer short so frames are not stale on arrival
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.realtime = realtime
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25
+        self.captured = 0
+        self.dropped = 0
+        self.ended = False
+
+        self._latest = None
+        self._taken = -1
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._capture, daemon=True)
+        self._thread.start()
+
+    def _capture(self):
+        start = time.perf_counter()
+        while not self._closed:
+            ok, frame = self.cap.read()
+            if not ok:
+                break
+            if self.realtime:
+                delay = start + self.captured / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            with self._cond:
+                if self._latest is not None and self._latest[0] > self._taken:
+                    self.dropped += 1
+                self._latest = (self.captured, frame, time.perf_counter())
+                self.captured += 1
+                self._cond.notify_all()
+
+        with self._cond:
+            self.ended = True
+            self._cond.notify_all()
+
+    def read(self, after=-1, timeout=None):
+        """Return (sequence, frame, capture_time) newer than `after`, or None on timeout/end"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.ended or (self._latest is not None and self._latest[0] > after),
+                                timeout)
+            if self._latest is None or self._latest[0] <= after:
+                return None
+            self._taken = self._latest[0]
+            return self._latest
+
+    def close(self):
+        self._closed = True
+        self._thread.join(timeout=2)
+        self.cap.release()
+
+
+def main():
+    from attendance import SimpleAttendance
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.splitlines()[2:]))
+    parser.add_argument("source", help="webcam index, RTSP URL or video file")
+    parser.add_argument("--realtime", action="store_true", help="pace a file source at its frame rate")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--workers", type=int, default=1, help="recognition worker processes")
+    parser.add_argument("--headless", action="store_true", help="don't open a preview window")
+    parser.add_argument("--roi", type=parse_roi, action="append",
+                        help="x,y,w,h (fractions of the frame) searched at full resolution; repeatable")
+    parser.add_argument("--no-quality", action="store_true",
+                        help="encode every detected face, even tiny, blurred or profile ones")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--metrics", help="write per-stage timings to this file (.prom for Prometheus text, else JSON)")
+    args = parser.parse_args()
+
+    metrics = Metrics(enabled=bool(args.metrics))
+    attendance = SimpleAttendance(tolerance=args.tolerance, metrics=metrics)
+    reader = LatestFrameReader(args.source, realtime=args.realtime)
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    def show_frame(result):
+        if deadline is not None and time.perf_counter() > deadline:
+            return False
+        if not args.headless:
+            cv2.imshow('Live Attendance', result.frame)
+            return not (cv2.waitKey(1) & 0xFF == ord('q'))
+
+    pipeline = VideoPipeline(attendance, workers=args.workers, render=not args.headless, on_frame=show_frame,
+                             metrics=metrics, rois=args.roi, quality=not args.no_quality)
+    print(f"Streaming from {args.source} - press 'q' (or Ctrl+C) to stop")
+    try:
+        summary = pipeline.run_stream(reader)
+    except KeyboardInterrupt:
+        pipeline.stop()
+        summary = pipeline.summary(0)
+    if not args.headless:
+        cv2.destroyAllWindows()
+
+    print(format_summary(summary))
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"✓ Metrics written to {args.metrics}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+from collections import Counter
+
+import cv2
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    if bottom <= top or right <= left:
+        return 0.0
+    inter = (bottom - top) * (right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+def create_cv2_tracker(kind="KCF"):
+    """Instantiate an OpenCV single-object tracker, or None if unavailable"""
+    for module in (cv2, getattr(cv2, "legacy", None)):
+        factory = getattr(module, f"Tracker{kind}_create", None)
+        if factory is not None:
+            return factory()
+    return None
+
+
+class Track:
+    """One face followed across frames, with accumulated identity votes"""
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.votes = Counter()
+        self.misses = 0
+        self.lost = False
+        self.cv2_tracker = None
+        self.encoded_box = None
+        self.deferred = 0
+        self.attempts = 0
+
+    @property
+    def total_votes(self):
+        return sum(self.votes.values())
+
+    def vote(self, name):
+        """Record the identity from a good encoding of the face in its current box"""
+        self.votes[name] += 1
+        self.lost = False
+        self.attempted()
+
+    def attempted(self):
+        """Count an encoding attempt on the face in its current box, whether or not it passed the gate"""
+        self.attempts += 1
+        self.encoded_box = self.box
+        self.deferred = 0
+
+    def identity(self, min_votes, min_share):
+        """Confirmed name, or None while the votes are too few or split"""
+        if not self.votes:
+            return None
+        name, count = self.votes.most_common(1)[0]
+        if count >= min_votes and count / self.total_votes >= min_share:
+            return name
+        return None
+
+
+class FaceTracker:
+    """Keyframe detections associated by IoU, propagated in between.
+
+    On keyframes detected boxes are matched greedily to existing tracks by
+    IoU; unmatched detections start new tracks and tracks missing for more
+    than max_misses keyframes are dropped. Between keyframes boxes are moved
+    by an OpenCV tracker (KCF by default) when one is available, otherwise
+    they stay where they were last detected.
+
+    A track only needs encoding while its identity is unconfirmed (fewer
+    than min_votes, or the top name has less than min_share of the votes)
+    or after it was lost and re-found. Unconfirmed tracks stop being
+    re-encoded after max_votes attempts so one ambiguous face can't cost
+    an encode every frame; faces the quality gate rejected count as
+    attempts too. A face that has barely moved since its last attempt
+    (box IoU >= dedupe_iou) would give the same vote or rejection again,
+    so it is deferred for up to refresh_every frames.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=2, min_votes=2, min_share=0.6,
+                 max_votes=5, tracker_kind="KCF", dedupe_iou=0.9, refresh_every=3):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_votes = min_votes
+        self.min_share = min_share
+        self.max_votes = max_votes
+        self.tracker_kind = tracker_kind
+        self.dedupe_iou = dedupe_iou
+        self.refresh_every = refresh_every
+        self.tracks = []
+        self._next_id = 1
+        self.stats = Counter()
+
+    def _start_cv2_tracker(self, track, frame):
+        if self.tracker_kind is None:
+            return
+        tracker = create_cv2_tracker(self.tracker_kind)
+        if tracker is None:
+            self.tracker_kind = None
+            return
+        top, right, bottom, left = track.box
+        tracker.init(frame, (left, top, right - left, bottom - top))
+        track.cv2_tracker = tracker
+
+    def update(self, boxes, frame):
+        """Keyframe: associate detected boxes with tracks; returns live tracks"""
+        self.stats["keyframes"] += 1
+        pairs = sorted(((iou(track.box, box), t, d)
+                        for t, track in enumerate(self.tracks)
+                        for d, box in enumerate(boxes)), reverse=True)
+
+        matched_tracks, matched_boxes = set(), set()
+        for overlap, t, d in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(d)
+            track = self.tracks[t]
+            track.box = boxes[d]
+            if track.misses:
+                track.lost = True
+            track.misses = 0
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+
+        for d, box in enumerate(boxes):
+            if d not in matched_boxes:
+                self.tracks.append(Track(self._next_id, box))
+                self._next_id += 1
+                self.stats["tracks"] += 1
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        for track in self.tracks:
+            if not track.misses:
+                self._start_cv2_tracker(track, frame)
+        return self.visible()
+
+    def propagate(self, frame):
+        """Between keyframes: move boxes with the OpenCV trackers"""
+        self.stats["tracked_frames"] += 1
+        height, width = frame.shape[:2]
+        for track in self.visible():
+            if track.cv2_tracker is None:
+                continue
+            ok, (x, y, w, h) = track.cv2_tracker.update(frame)
+            if ok:
+                x, y = max(0, int(x)), max(0, int(y))
+                track.box = (y, min(width, x + int(w)), min(height, y + int(h)), x)
+            else:
+                track.cv2_tracker = None
+                track.misses += 1
+        return self.visible()
+
+    def visible(self):
+        return [t for t in self.tracks if not t.misses]
+
+    def needs_encoding(self, tracks):
+        """Tracks whose identity should be (re)checked on this frame"""
+        pending = []
+        for track in tracks:
+            self.stats["observations"] += 1
+            if track.lost:
+                track.votes.clear()
+                track.attempts = 0
+                pending.append(track)
+            elif track.identity(self.min_votes, self.min_share) is None and track.attempts < self.max_votes:
+                if (track.encoded_box is not None and track.deferred < self.refresh_every
+                        and iou(track.box, track.encoded_box) >= self.dedupe_iou):
+                    track.deferred += 1
+                    self.stats["deduplicated"] += 1
+                    continue
+                pending.append(track)
+        return pending
+
+    def record(self, track, name):
+        """Count an encoding that got past the quality gate and add its vote to the track"""
+        self.stats["encoded"] += 1
+        track.vote(name)
+
+    def reject(self, track):
+        """Count a face the quality gate skipped as an attempt, so it is deferred and capped like a vote"""
+        self.stats["rejected"] += 1
+        track.attempted()
+
+    def name(self, track):
+        """Display/attendance name: the confirmed identity, else Unknown"""
+        return track.identity(self.min_votes, self.min_share) or "Unknown"
+
+    def summary(self):
+        observations = self.stats["observations"]
+        return {
+            "keyframes": self.stats["keyframes"],
+            "tracked_frames": self.stats["tracked_frames"],
+            "tracks": self.stats["tracks"],
+            "face_observations": observations,
+            "encoder_calls": self.stats["encoded"],
+            "encoder_calls_saved": observations - self.stats["encoded"],
+            "gate_rejections": self.stats["rejected"],
+            "deduplicated": self.stats["deduplicated"],
+        }